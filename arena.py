@@ -0,0 +1,217 @@
+import random
+from collections import deque
+
+from engine import DIRECTIONS, Board, Config, Food, FoodType, Obstacle, ObstacleMap, Snake
+
+# Сетевая игра без окна и без сети: несколько змеек на одном поле.
+# Arena - авторитетная симуляция на сервере, RemoteState - ее зеркало у
+# клиента, собранное из приветствия и дельт.
+#
+# Дельта тика содержит только изменения: новые головы, убранные хвосты,
+# погибших и вошедших игроков, новую еду и изменившиеся очки. Клиент
+# применяет их в порядке left, joined, died, tails, heads. Между тиками
+# ушедший освобождает клетки раньше, чем на них может появиться вошедший
+# (обратного наложения не бывает: пока оба на поле, их клетки разные);
+# died - уже внутри тика, после появления вошедших, и может касаться
+# игрока, вошедшего в этой же дельте.
+
+class Arena:
+    def __init__(self, seed=None, width=None, height=None):
+        self.rng = random.Random(seed)
+        self.board = Board(width, height)
+        self.obstacles = ObstacleMap(self.board.width)
+        for _ in range(3):
+            self.obstacles.add(Obstacle(self.board, self.rng))
+        self.tick = 0
+        self.food = Food(self.board, self.rng, self.tick)
+        self.snakes = {}   # игрок -> Snake (только живые)
+        self.scores = {}   # игрок -> счет
+        self.actions = {}  # игрок -> последний присланный поворот
+        self.next_id = 1
+        # Изменения между тиками, уйдут в следующую дельту
+        self.joined = []
+        self.left = []
+
+    def add_player(self):
+        player = self.next_id
+        self.next_id += 1
+        self.scores[player] = 0
+        self.spawn(player)
+        return player
+
+    def spawn(self, player):
+        # Голова на свободной клетке, справа от которой тоже свободно:
+        # змейка стартует вправо и не должна врезаться в первый же тик
+        # Ушедший игрок (например, отключенный сервером) не возрождается
+        if player in self.snakes or player not in self.scores:
+            return False
+        board = self.board
+        for _ in range(100):
+            cell = board.random_free_cell(self.rng)
+            if cell is None:
+                return False
+            x, y = board.position(cell)
+            if board.is_free(((x + 1) % board.width, y)):
+                break
+        self.snakes[player] = Snake(board, cell)
+        self.joined.append(player)
+        return True
+
+    def remove_snake(self, player):
+        snake = self.snakes.pop(player, None)
+        if snake is not None:
+            for cell in snake.positions.iter_cells():
+                self.board.set_cell(cell, Board.EMPTY)
+        self.actions.pop(player, None)
+
+    def remove_player(self, player):
+        self.remove_snake(player)
+        self.scores.pop(player, None)
+        self.left.append(player)
+
+    def set_action(self, player, direction):
+        # Храним направление из DIRECTIONS, а не присланное: [0.0, 1] равно
+        # (0, 1), но дробное число сломает индекс клетки в Snake.move
+        if player in self.snakes and direction in DIRECTIONS:
+            self.actions[player] = DIRECTIONS[DIRECTIONS.index(direction)]
+
+    def body(self, player):
+        return [list(position) for position in self.snakes[player].positions]
+
+    def step(self):
+        # Один тик комнаты; возвращает дельту для рассылки
+        self.tick += 1
+        delta = {'type': 'tick', 'tick': self.tick}
+        if self.joined:
+            delta['joined'] = [[player, self.body(player)] for player in self.joined
+                               if player in self.snakes]
+            self.joined = []
+        if self.left:
+            delta['left'] = self.left
+            self.left = []
+
+        died, heads, tails, scores = [], [], [], []
+        food = self.food
+        for player, snake in list(self.snakes.items()):
+            action = self.actions.pop(player, None)
+            if action is not None:
+                snake.change_direction(action)
+            if not snake.move():
+                died.append(player)
+                self.remove_snake(player)
+                continue
+            if snake.removed_tail is not None:
+                tails.append([player, *self.board.position(snake.removed_tail)])
+            if snake.added_head is not None:
+                heads.append([player, *self.board.position(snake.added_head)])
+            if snake.positions.head_cell() == self.food.cell:
+                self.scores[player] += Config.FOOD_SCORES[self.food.food_type]
+                scores.append([player, self.scores[player]])
+                if self.food.food_type == FoodType.SPEED:
+                    snake.add_effect('speed', Config.EFFECT_DURATION)
+                elif self.food.food_type == FoodType.SLOW:
+                    snake.add_effect('slow', Config.EFFECT_DURATION)
+                snake.grow_snake()
+                self.food = Food(self.board, self.rng, self.tick)
+
+        # Особая еда исчезает; если еде не было места, пробуем снова
+        if self.food.is_expired(self.tick) or self.food.cell is None:
+            self.food.remove(self.board)
+            self.food = Food(self.board, self.rng, self.tick)
+
+        if died:
+            delta['died'] = died
+        if tails:
+            delta['tails'] = tails
+        if heads:
+            delta['heads'] = heads
+        if scores:
+            delta['scores'] = scores
+        if self.food is not food:
+            delta['food'] = self.food_state()
+        return delta
+
+    def food_state(self):
+        if self.food.cell is None:
+            return None
+        return [*self.food.position, self.food.food_type.value]
+
+    def welcome(self, player):
+        # Полное состояние для нового клиента
+        return {
+            'type': 'welcome',
+            'player': player,
+            'tick': self.tick,
+            'width': self.board.width,
+            'height': self.board.height,
+            'speed': Config.NET_TICK_RATE,
+            'snakes': [[other, self.body(other)] for other in self.snakes
+                       if other not in self.joined],
+            'scores': [[other, score] for other, score in self.scores.items()],
+            'food': self.food_state(),
+            'obstacles': [list(position) for position in self.obstacles],
+        }
+
+class RemoteState:
+    # Зеркало комнаты у клиента: сетка занятости (для размеров поля и
+    # камеры окна) и тела змеек как очереди клеток от головы к хвосту
+    def __init__(self, welcome):
+        self.player = welcome['player']
+        self.tick = welcome['tick']
+        self.speed = welcome['speed']
+        self.board = Board(welcome['width'], welcome['height'])
+        self.snakes = {}
+        self.scores = dict(welcome['scores'])
+        self.obstacles = [tuple(position) for position in welcome['obstacles']]
+        for position in self.obstacles:
+            self.board.set(position, Board.OBSTACLE)
+        self.food = None
+        self.set_food(welcome['food'])
+        for player, body in welcome['snakes']:
+            self.add_snake(player, body)
+
+    def add_snake(self, player, body):
+        self.snakes[player] = deque(tuple(position) for position in body)
+        for position in self.snakes[player]:
+            self.board.set(position, Board.SNAKE)
+
+    def remove_snake(self, player):
+        for position in self.snakes.pop(player, ()):
+            self.board.set(position, Board.EMPTY)
+
+    def set_food(self, food):
+        if self.food is not None and self.board.get(self.food[:2]) == Board.FOOD:
+            self.board.set(self.food[:2], Board.EMPTY)
+        self.food = None if food is None else (food[0], food[1], FoodType(food[2]))
+        if self.food is not None and self.board.is_free(self.food[:2]):
+            self.board.set(self.food[:2], Board.FOOD)
+
+    def apply(self, delta):
+        self.tick = delta['tick']
+        for player in delta.get('left', ()):
+            self.remove_snake(player)
+            self.scores.pop(player, None)
+        for player, body in delta.get('joined', ()):
+            self.add_snake(player, body)
+            self.scores.setdefault(player, 0)
+        for player in delta.get('died', ()):
+            self.remove_snake(player)
+        for player, x, y in delta.get('tails', ()):
+            self.snakes[player].pop()
+            self.board.set((x, y), Board.EMPTY)
+        for player, x, y in delta.get('heads', ()):
+            self.snakes[player].appendleft((x, y))
+            self.board.set((x, y), Board.SNAKE)
+        for player, score in delta.get('scores', ()):
+            self.scores[player] = score
+        if 'food' in delta:
+            self.set_food(delta['food'])
+
+    @property
+    def alive(self):
+        return self.player in self.snakes
+
+    def head(self):
+        # Голова своей змейки или None, если она погибла
+        body = self.snakes.get(self.player)
+        return body[0] if body else None
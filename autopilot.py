@@ -0,0 +1,147 @@
+from array import array
+from collections import deque
+
+from engine import DIRECTIONS, Board, Config
+
+# Автопилот: ведет змейку к еде по полю расстояний (BFS от еды в обход
+# препятствий, с заворотом краев) и не заходит туда, откуда не добраться
+# до хвоста.
+#
+# Поле расстояний зависит только от еды и препятствий, поэтому строится
+# заново лишь когда еда сменилась или добавилось препятствие. Да и тогда
+# BFS идет лениво: волна от еды расширяется ровно до клеток, о которых
+# спросили, и на следующих тиках продолжается с того же места; за одно
+# решение волна проходит не больше Config.AUTOPILOT_EXPANSION клеток, а для
+# еще не дошедших клеток берется расстояние с заворотом без учета
+# препятствий (на огромном поле волна догоняет за несколько тиков). Тело
+# змейки в поле не учитывается - оно меняется каждый тик; его обходит
+# проверка безопасности хода.
+
+UNREACHABLE = 1 << 30
+
+class Autopilot:
+    def __init__(self):
+        self.board = None
+        self.food_cell = None
+        self.obstacle_count = -1
+        # Метка поколения на клетку: расстояние в клетке действительно,
+        # только если ее метка равна текущему поколению (без очистки массивов)
+        self.generation = 0
+        self.stamps = None
+        self.distances = None
+        self.frontier = deque()
+        self.budget = 0
+        self.rebuilds = 0
+
+    def refresh(self, sim):
+        board = sim.board
+        if board is not self.board:
+            size = board.width * board.height
+            self.board = board
+            self.stamps = array('I', bytes(4 * size))
+            self.distances = array('i', bytes(4 * size))
+            self.generation = 0
+            self.food_cell = None
+        if sim.food.cell == self.food_cell and len(sim.obstacles) == self.obstacle_count:
+            return
+        self.food_cell = sim.food.cell
+        self.obstacle_count = len(sim.obstacles)
+        self.generation += 1
+        self.rebuilds += 1
+        self.stamps[self.food_cell] = self.generation
+        self.distances[self.food_cell] = 0
+        self.frontier = deque([self.food_cell])
+
+    def neighbours(self, cell, step=1):
+        width, height = self.board.width, self.board.height
+        x, y = cell % width, cell // width
+        for dx, dy in DIRECTIONS:
+            yield ((y + dy * step) % height) * width + (x + dx * step) % width
+
+    def distance(self, cell):
+        # Расстояние от еды до клетки; волна расширяется, пока клетка не найдена
+        stamps, distances, frontier = self.stamps, self.distances, self.frontier
+        generation = self.generation
+        cells = self.board.cells
+        while stamps[cell] != generation and frontier and self.budget > 0:
+            self.budget -= 1
+            current = frontier.popleft()
+            next_distance = distances[current] + 1
+            for neighbour in self.neighbours(current):
+                if stamps[neighbour] != generation and cells[neighbour] != Board.OBSTACLE:
+                    stamps[neighbour] = generation
+                    distances[neighbour] = next_distance
+                    frontier.append(neighbour)
+        if stamps[cell] == generation:
+            return distances[cell]
+        if not frontier:
+            return UNREACHABLE
+        return self.estimate(cell)
+
+    def estimate(self, cell):
+        width, height = self.board.width, self.board.height
+        dx = abs(cell % width - self.food_cell % width)
+        dy = abs(cell // width - self.food_cell // width)
+        return min(dx, width - dx) + min(dy, height - dy)
+
+    def room(self, snake, start):
+        # Сколько свободных клеток доступно голове из start, с ограничением:
+        # если места больше длины змейки или виден хвост (он освободит
+        # дорогу), ход безопасен, и дальше считать незачем
+        limit = len(snake.positions)
+        tail = snake.positions.tail_cell()
+        cells = self.board.cells
+        seen = {start}
+        stack = [start]
+        while stack:
+            for neighbour in self.neighbours(stack.pop()):
+                if neighbour == tail:
+                    return limit + 1
+                if neighbour not in seen and (cells[neighbour] == Board.EMPTY or
+                                              cells[neighbour] == Board.FOOD):
+                    seen.add(neighbour)
+                    if len(seen) > limit:
+                        return limit + 1
+                    stack.append(neighbour)
+        return len(seen)
+
+    def decide(self, sim):
+        # Направление на следующий тик или None, если ходить некуда
+        if sim.done or sim.food.cell is None:
+            return None
+        self.refresh(sim)
+        self.budget = Config.AUTOPILOT_EXPANSION
+        snake = sim.snake
+        cells = self.board.cells
+        step = 2 if snake.has_effect('speed') else 1
+        head = snake.positions.head_cell()
+
+        candidates = []
+        for direction, target in zip(DIRECTIONS, self.neighbours(head, step)):
+            if (-direction[0], -direction[1]) == snake.direction:
+                continue
+            if cells[target] != Board.EMPTY and cells[target] != Board.FOOD:
+                continue
+            # Ближе к еде, а при равенстве - не поворачивать лишний раз
+            rank = (self.distance(target), direction != snake.direction)
+            candidates.append((rank, direction, target))
+        if not candidates:
+            return None
+        candidates.sort()
+
+        limit = len(snake.positions)
+        best, best_room = None, -1
+        for _, direction, target in candidates:
+            room = self.room(snake, target)
+            if room > limit:
+                return direction
+            if room > best_room:
+                best, best_room = direction, room
+        # Безопасного хода нет: уходим туда, где дольше продержимся
+        return best
+
+default_autopilot = Autopilot()
+
+def autopilot_agent(sim, rng):
+    # Автопилот в виде бота для турнира и безголовых прогонов
+    return default_autopilot.decide(sim)
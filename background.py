@@ -0,0 +1,34 @@
+import queue
+import threading
+
+from engine import Config
+
+# Фоновый поток для работы с диском (загрузка шрифта, звуков и рекордов
+# при запуске, запись рекордов, записей партий и трасс),
+# чтобы игровой цикл не ждал медленный диск. Задачи выполняются по
+# порядку; очередь ограничена, и если диск совсем не успевает, submit
+# подождет, а не будет копить задачи без предела.
+
+class BackgroundWriter:
+    def __init__(self, maxsize=None):
+        self.queue = queue.Queue(maxsize or Config.IO_QUEUE_SIZE)
+        self.thread = threading.Thread(target=self.run, name='background-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, job, *args):
+        self.queue.put((job, args))
+
+    def run(self):
+        while True:
+            job, args = self.queue.get()
+            if job is None:
+                break
+            try:
+                job(*args)
+            except Exception as e:
+                print(f"Ошибка фоновой записи: {e}")
+
+    def close(self):
+        # Дописываем все, что уже в очереди, и останавливаем поток
+        self.queue.put((None, ()))
+        self.thread.join()
@@ -0,0 +1,291 @@
+import random
+import time
+
+import numpy
+
+from engine import DIRECTIONS, Board, Config, Food, FoodType, Simulation
+
+# Пакетный движок: B партий в массивах numpy, один вызов step двигает все.
+# Каждый тик (ход, столкновения, эффекты, истечение еды) считается
+# векторно. Редкие случайные события (новая еда, препятствия на новом
+# уровне) разыгрываются по одной партии на ее собственном random.Random
+# теми же вызовами, что и в Simulation, поэтому при одинаковых зернах
+# и действиях партии совпадают с обычным движком клетка в клетку.
+
+FOOD_TYPES = Food.TYPES
+FOOD_CODES = {food_type: code for code, food_type in enumerate(FOOD_TYPES)}
+FOOD_NORMAL = FOOD_CODES[FoodType.NORMAL]
+
+DIRECTION_X = numpy.array([d[0] for d in DIRECTIONS], dtype=numpy.int32)
+DIRECTION_Y = numpy.array([d[1] for d in DIRECTIONS], dtype=numpy.int32)
+
+class BatchSimulation:
+    def __init__(self, seeds, width=None, height=None):
+        self.width = width or Config.BOARD_WIDTH
+        self.height = height or Config.BOARD_HEIGHT
+        self.reset(seeds)
+
+    def reset(self, seeds):
+        self.seeds = list(seeds)
+        self.rngs = [random.Random(seed) for seed in self.seeds]
+        count = len(self.seeds)
+        size = self.width * self.height
+        self.count = count
+        self.rows = numpy.arange(count)
+
+        # Поле и индекс свободных клеток, как в Board, построчно
+        self.cells = numpy.zeros((count, size), dtype=numpy.uint8)
+        self.free = numpy.tile(numpy.arange(size, dtype=numpy.int32), (count, 1))
+        self.free_slot = self.free.copy()
+        self.free_len = numpy.full(count, size, dtype=numpy.int32)
+
+        # Змейка: кольцевой буфер клеток, голова в start
+        self.body = numpy.zeros((count, size), dtype=numpy.int32)
+        self.start = numpy.zeros(count, dtype=numpy.int32)
+        self.length = numpy.zeros(count, dtype=numpy.int32)
+        self.dir_x = numpy.ones(count, dtype=numpy.int32)
+        self.dir_y = numpy.zeros(count, dtype=numpy.int32)
+        self.pending_growth = numpy.zeros(count, dtype=numpy.int32)
+        self.speed_effect = numpy.zeros(count, dtype=numpy.int32)
+        self.slow_effect = numpy.zeros(count, dtype=numpy.int32)
+        self.slow_skip = numpy.zeros(count, dtype=bool)
+
+        # Еда: клетка (-1 - некуда поставить), тип и тик появления
+        self.food_cell = numpy.zeros(count, dtype=numpy.int32)
+        self.food_type = numpy.zeros(count, dtype=numpy.int32)
+        self.food_tick = numpy.zeros(count, dtype=numpy.int32)
+
+        self.tick = numpy.zeros(count, dtype=numpy.int32)
+        self.score = numpy.zeros(count, dtype=numpy.int32)
+        self.speed = numpy.full(count, Config.INITIAL_SPEED, dtype=numpy.int32)
+        self.level = numpy.ones(count, dtype=numpy.int32)
+        self.done = numpy.zeros(count, dtype=bool)
+        self.won = numpy.zeros(count, dtype=bool)
+
+        center = (self.height // 2) * self.width + self.width // 2
+        for i in range(count):
+            self.body[i, 0] = center
+            self.length[i] = 1
+            self.set_cell(i, center, Board.SNAKE)
+            for _ in range(3):
+                self.add_obstacle(i)
+            self.spawn_food(i)
+
+    # Операции над полем одной партии - те же, что Board.set_cell
+
+    def set_cell(self, i, cell, value):
+        old = self.cells[i, cell]
+        if old == value:
+            return
+        if old == Board.EMPTY:
+            slot = self.free_slot[i, cell]
+            last = self.free[i, self.free_len[i] - 1]
+            self.free[i, slot] = last
+            self.free_slot[i, last] = slot
+            self.free_len[i] -= 1
+        elif value == Board.EMPTY:
+            self.free_slot[i, cell] = self.free_len[i]
+            self.free[i, self.free_len[i]] = cell
+            self.free_len[i] += 1
+        self.cells[i, cell] = value
+
+    def random_free_cell(self, i):
+        if not self.free_len[i]:
+            return None
+        return int(self.free[i, self.rngs[i].randrange(int(self.free_len[i]))])
+
+    def add_obstacle(self, i):
+        # Повторяет Obstacle.generate_obstacle
+        rng = self.rngs[i]
+        length = rng.randint(3, 5)
+        start = self.random_free_cell(i)
+        if start is None:
+            return
+        start_x, start_y = start % self.width, start // self.width
+        for k in range(length):
+            cell = start_y * self.width + (start_x + k) % self.width
+            if self.cells[i, cell] != Board.EMPTY:
+                break
+            self.set_cell(i, cell, Board.OBSTACLE)
+
+    def spawn_food(self, i):
+        # Повторяет Food.__init__
+        food_type = Food.choose_food_type(self.rngs[i])
+        self.food_type[i] = FOOD_CODES[food_type]
+        cell = self.random_free_cell(i)
+        if cell is None:
+            self.food_cell[i] = -1
+        else:
+            self.food_cell[i] = cell
+            self.set_cell(i, cell, Board.FOOD)
+        self.food_tick[i] = self.tick[i]
+
+    def eat_food(self, i):
+        # Повторяет Simulation.handle_food_collision
+        food_type = FOOD_TYPES[self.food_type[i]]
+        score = Config.FOOD_SCORES[food_type]
+        self.score[i] += score
+        if food_type == FoodType.SPEED:
+            self.speed_effect[i] = Config.EFFECT_DURATION
+        elif food_type == FoodType.SLOW:
+            self.slow_effect[i] = Config.EFFECT_DURATION
+        self.pending_growth[i] += 1
+        self.spawn_food(i)
+
+        if self.score[i] % 50 == 0:
+            self.speed[i] += Config.SPEED_INCREMENT
+            self.level[i] += 1
+            if self.level[i] % 2 == 0:
+                self.add_obstacle(i)
+        return score
+
+    # Векторные операции над подмножеством партий rows
+
+    def take_cells(self, rows, cells):
+        slots = self.free_slot[rows, cells]
+        last = self.free[rows, self.free_len[rows] - 1]
+        self.free[rows, slots] = last
+        self.free_slot[rows, last] = slots
+        self.free_len[rows] -= 1
+
+    def release_cells(self, rows, cells):
+        self.free_slot[rows, cells] = self.free_len[rows]
+        self.free[rows, self.free_len[rows]] = cells
+        self.free_len[rows] += 1
+
+    def update_effects(self, mask):
+        for effect in (self.speed_effect, self.slow_effect):
+            active = mask & (effect > 0)
+            effect[active] -= 1
+
+    def step(self, actions=None):
+        # actions: номер направления из DIRECTIONS для каждой партии или -1;
+        # возвращает очки за тик и признак конца партии
+        rewards = numpy.zeros(self.count, dtype=numpy.int32)
+        live = ~self.done
+        capacity = self.body.shape[1]
+
+        if actions is not None:
+            actions = numpy.asarray(actions)
+            turn = live & (actions >= 0)
+            new_x = DIRECTION_X[actions[turn]]
+            new_y = DIRECTION_Y[actions[turn]]
+            rows = self.rows[turn]
+            allowed = ~((new_x == -self.dir_x[rows]) & (new_y == -self.dir_y[rows]))
+            self.dir_x[rows[allowed]] = new_x[allowed]
+            self.dir_y[rows[allowed]] = new_y[allowed]
+
+        self.tick[live] += 1
+
+        # Замедление: ход через тик
+        slow_mode = live & (self.slow_effect > 0) & (self.speed_effect == 0)
+        self.slow_skip[slow_mode] = ~self.slow_skip[slow_mode]
+        skip = slow_mode & self.slow_skip
+        movers = live & ~skip
+
+        # Новая голова
+        rows = self.rows[movers]
+        step = numpy.where(self.speed_effect[rows] > 0, 2, 1)
+        head = self.body[rows, self.start[rows]]
+        new_x = (head % self.width + self.dir_x[rows] * step) % self.width
+        new_y = (head // self.width + self.dir_y[rows] * step) % self.height
+        new_head = new_y * self.width + new_x
+        target = self.cells[rows, new_head]
+
+        dead = (target != Board.EMPTY) & (target != Board.FOOD)
+        self.done[rows[dead]] = True
+        alive = ~dead
+        rows, new_head, target = rows[alive], new_head[alive], target[alive]
+
+        start = (self.start[rows] - 1) % capacity
+        self.start[rows] = start
+        self.body[rows, start] = new_head
+        self.length[rows] += 1
+
+        # Рост или снятие хвоста
+        growing = self.pending_growth[rows] > 0
+        self.pending_growth[rows[growing]] -= 1
+        shrink = rows[~growing]
+        self.length[shrink] -= 1
+        tail = self.body[shrink, (self.start[shrink] + self.length[shrink]) % capacity]
+        self.cells[shrink, tail] = Board.EMPTY
+        self.release_cells(shrink, tail)
+
+        empty = target == Board.EMPTY
+        self.take_cells(rows[empty], new_head[empty])
+        self.cells[rows, new_head] = Board.SNAKE
+
+        moved = numpy.zeros(self.count, dtype=bool)
+        moved[rows] = True
+        self.update_effects(skip | moved)
+
+        # Еда: съедена или истекла - редкие события, по одной партии
+        ate = moved & (self.body[self.rows, self.start] == self.food_cell)
+        for i in numpy.flatnonzero(ate):
+            rewards[i] = self.eat_food(i)
+
+        expired = (moved | skip) & (self.food_type != FOOD_NORMAL) & \
+            (self.tick - self.food_tick > Config.FOOD_LIFETIME)
+        for i in numpy.flatnonzero(expired):
+            cell = self.food_cell[i]
+            if cell >= 0 and self.cells[i, cell] == Board.FOOD:
+                self.set_cell(i, cell, Board.EMPTY)
+            self.spawn_food(i)
+
+        won = (moved | skip) & (self.food_cell < 0)
+        self.done |= won
+        self.won |= won
+        return rewards, self.done.copy()
+
+    def snake_positions(self, i):
+        capacity = self.body.shape[1]
+        cells = self.body[i, (self.start[i] + numpy.arange(self.length[i])) % capacity]
+        return [(int(cell) % self.width, int(cell) // self.width) for cell in cells]
+
+def check_parity(games=200, ticks=2000, seed=0, width=None, height=None, agent=None):
+    # Сверка с Simulation: одинаковые зерна и действия - одинаковые партии.
+    # agent(sim, rng) - бот, который ходит по партиям Simulation (например,
+    # greedy_agent: он ест, набирает уровни и заполняет маленькое поле);
+    # без него действия - случайные повороты
+    rng = numpy.random.default_rng(seed)
+    agent_rng = random.Random(seed)
+    seeds = [int(s) for s in rng.integers(0, 2**32, games)]
+    batch = BatchSimulation(seeds, width, height)
+    sims = [Simulation(s, width, height) for s in seeds]
+
+    for tick in range(ticks):
+        if agent is None:
+            actions = numpy.where(rng.random(games) < 0.1, rng.integers(0, 4, games), -1)
+        else:
+            actions = [agent(sim, agent_rng) for sim in sims]
+            actions = numpy.array([-1 if action is None else DIRECTIONS.index(action)
+                                   for action in actions])
+        rewards, dones = batch.step(actions)
+        for i, sim in enumerate(sims):
+            result = sim.step(None if actions[i] < 0 else DIRECTIONS[actions[i]])
+            food = sim.food.cell if sim.food.cell is not None else -1
+            if (result.reward != rewards[i] or result.done != dones[i] or
+                    sim.score != batch.score[i] or sim.level != batch.level[i] or
+                    food != batch.food_cell[i] or
+                    list(sim.snake.positions) != batch.snake_positions(i) or
+                    bytes(sim.board.cells) != batch.cells[i].tobytes()):
+                raise AssertionError(f'расхождение в партии {i} на тике {tick + 1}')
+        if dones.all():
+            break
+    return tick + 1
+
+def bench_batch(games=1000, ticks=1000, seed=0):
+    rng = numpy.random.default_rng(seed)
+    batch = BatchSimulation(range(games))
+    started = time.perf_counter()
+    steps = 0
+    for _ in range(ticks):
+        steps += int((~batch.done).sum())
+        actions = numpy.where(rng.random(games) < 0.1, rng.integers(0, 4, games), -1)
+        batch.step(actions)
+    return steps / (time.perf_counter() - started)
+
+if __name__ == "__main__":
+    ticks = check_parity()
+    print(f'Совпадение с Simulation: {ticks} тиков без расхождений')
+    print(f'Шагов партий в секунду: {bench_batch():.0f}')
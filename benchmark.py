@@ -0,0 +1,269 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Окно и звук без устройств, чтобы замеры шли где угодно
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import network
+from autopilot import Autopilot
+from engine import Board, Config, Food, Simulation, Snake, random_agent
+
+# Замеры скорости игры: python benchmark.py [--json results.json] [--compare old.json]
+# Каждый сценарий повторяется несколько раз, берется лучший результат.
+
+REPEATS = 3
+
+def best_of(measure, repeats=REPEATS):
+    return min(measure() for _ in range(repeats))
+
+def bench_move(length, ticks=20000):
+    # Прямая змейка длины length в полосе шириной 4*length:
+    # голова идет вправо и никогда не догоняет хвост
+    board = Board(length * 4, 3)
+    snake = Snake(board)
+    board.set_cell(snake.positions.pop(), Board.EMPTY)
+    for x in range(length):
+        snake.positions.appendleft(board.index((x, 1)))
+        board.set((x, 1), Board.SNAKE)
+
+    started = time.perf_counter()
+    for _ in range(ticks):
+        if not snake.move():
+            raise RuntimeError('змейка врезалась во время замера')
+    elapsed = time.perf_counter() - started
+    return elapsed / ticks * 1e6
+
+def bench_spawn(fill, size=100, spawns=20000):
+    # Выбор клетки для еды на поле, занятом на долю fill
+    rng = random.Random(0)
+    board = Board(size, size)
+    cells = list(range(size * size))
+    rng.shuffle(cells)
+    for cell in cells[:int(len(cells) * fill)]:
+        board.set_cell(cell, Board.OBSTACLE)
+    food = Food(board, rng)
+    food.remove(board)
+
+    started = time.perf_counter()
+    for _ in range(spawns):
+        food.randomize_position(board, rng)
+    return (time.perf_counter() - started) / spawns * 1e6
+
+def bench_autopilot(games=20, max_ticks=2000):
+    # Время одного решения автопилота в обычных партиях
+    autopilot = Autopilot()
+    decisions = 0
+    elapsed = 0.0
+    for seed in range(games):
+        sim = Simulation(seed)
+        while not sim.done and sim.tick < max_ticks:
+            started = time.perf_counter()
+            action = autopilot.decide(sim)
+            elapsed += time.perf_counter() - started
+            decisions += 1
+            sim.step(action)
+    return elapsed / decisions * 1e6
+
+def make_game():
+    import pygame
+    import main
+    Config.SCORE_STORE = 'sqlite:' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    pygame.init()
+    game = main.Game()
+    game.in_menu = False
+    return game
+
+def bench_draw(game, frames=300, full=False):
+    # Кадр игры: тик и отрисовка (инкрементальная или полная)
+    game.reset_game()
+    game.in_menu = False
+    rng = random.Random(0)
+    started = time.perf_counter()
+    for _ in range(frames):
+        if game.game_over:
+            game.reset_game()
+            game.in_menu = False
+        game.queue_direction(random_agent(game.sim, rng) or game.snake.direction)
+        game.update()
+        game.full_redraw = full
+        game.draw()
+    return (time.perf_counter() - started) / frames * 1e3
+
+def bench_sound(cold):
+    import pygame
+    import main
+    pygame.mixer.init()
+    cache_dir = Config.SOUND_CACHE_DIR
+    Config.SOUND_CACHE_DIR = tempfile.mkdtemp()
+    try:
+        if not cold:
+            main.SoundManager()  # прогреваем кэш на диске
+        started = time.perf_counter()
+        main.SoundManager()
+        return (time.perf_counter() - started) * 1e3
+    finally:
+        Config.SOUND_CACHE_DIR = cache_dir
+
+def bench_server(rooms=200, players=2, seconds=3.0):
+    # Тик сервера с сотнями комнат и клиентами по loopback в том же процессе
+    metrics = asyncio.run(network.load_test(rooms, players, seconds))
+    return metrics['tick_p50_ms'], metrics['tick_p99_ms']
+
+STARTUP_SCRIPT = '''
+import time
+started = time.perf_counter()
+import os, tempfile
+import pygame
+import main
+main.Config.SCORE_STORE = 'sqlite:' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+pygame.init()
+game = main.Game()
+game.draw()
+print((time.perf_counter() - started) * 1e3)
+game.io.close()
+'''
+
+def bench_startup():
+    # Холодный старт отдельного процесса: импорт, окно, первый кадр
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=here,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+def bench_tick_alloc(step, restart, ticks=20000):
+    # Память, которую тик берет и тут же отдает (пик tracemalloc над
+    # текущим объемом), в среднем на тик; тики с перезапуском партии
+    # не считаются
+    tracemalloc.start()
+    total = counted = 0
+    for _ in range(ticks):
+        if restart():
+            continue
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        step()
+        total += tracemalloc.get_traced_memory()[1] - current
+        counted += 1
+    tracemalloc.stop()
+    return total / max(counted, 1)
+
+def bench_sim_alloc():
+    sim = Simulation(7)
+
+    def restart():
+        if sim.done:
+            sim.reset(sim.seed + 1)
+            return True
+        return False
+    return bench_tick_alloc(sim.step, restart)
+
+def bench_update_alloc(game):
+    game.reset_game()
+    game.in_menu = False
+
+    def restart():
+        if game.game_over:
+            game.reset_game()
+            game.in_menu = False
+            return True
+        return False
+    return bench_tick_alloc(game.update, restart)
+
+def bench_memory(games=1000, ticks=300):
+    # Память на одну партию после нескольких сотен тиков
+    # (змейке заранее добавлен рост на 100 клеток)
+    tracemalloc.start()
+    states = []
+    for seed in range(games):
+        sim = Simulation(seed)
+        rng = random.Random(seed)
+        sim.snake.grow_snake(100)
+        for _ in range(ticks):
+            if sim.done:
+                break
+            sim.step(random_agent(sim, rng))
+        states.append(sim)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used / games
+
+def run_benchmarks():
+    results = {}
+
+    def record(name, value, unit):
+        results[name] = {'value': value, 'unit': unit}
+        print(f'  {name:<24} {value:>10.2f} {unit}')
+
+    print('Сценарии:')
+    for length in (10, 100, 1000):
+        record(f'move_length_{length}', best_of(lambda: bench_move(length)), 'us/tick')
+    for fill in (0.1, 0.5, 0.95):
+        record(f'spawn_fill_{int(fill * 100)}', best_of(lambda: bench_spawn(fill)), 'us/spawn')
+    record('autopilot_decision', best_of(bench_autopilot), 'us/decision')
+    record('memory_per_game', bench_memory() / 1024, 'KB')
+    p50, p99 = bench_server()
+    record('server_tick_p50', p50, 'ms/tick')
+    record('server_tick_p99', p99, 'ms/tick')
+
+    game = make_game()
+    record('draw_incremental', best_of(lambda: bench_draw(game)), 'ms/frame')
+    record('draw_full', best_of(lambda: bench_draw(game, full=True)), 'ms/frame')
+    record('sim_step_alloc', bench_sim_alloc(), 'B/tick')
+    record('game_update_alloc', bench_update_alloc(game), 'B/tick')
+    game.io.close()
+    record('sound_init_cold', best_of(lambda: bench_sound(True)), 'ms')
+    record('sound_init_cached', best_of(lambda: bench_sound(False)), 'ms')
+    record('startup_first_frame', best_of(bench_startup), 'ms')
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, path):
+    # Отношение к прошлому прогону: больше 1 - стало медленнее
+    with open(path) as f:
+        old = json.load(f)
+    print(f"Сравнение с {path} (коммит {old.get('commit')}):")
+    for name, entry in results.items():
+        previous = old['results'].get(name)
+        if previous and previous['value']:
+            ratio = entry['value'] / previous['value']
+            mark = '  <- медленнее' if ratio > 1.1 else ''
+            print(f'  {name:<24} x{ratio:.2f}{mark}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры скорости змейки')
+    parser.add_argument('--json', help='сохранить результаты в JSON-файл')
+    parser.add_argument('--compare', help='сравнить с результатами из JSON-файла')
+    args = parser.parse_args()
+
+    results = run_benchmarks()
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,663 @@
+import random
+import time
+from array import array
+from bisect import bisect
+from enum import Enum
+from itertools import accumulate
+
+# Движок игры без pygame: только состояние и правила.
+# Используется окном игры (main.py) и безголовыми прогонами (--headless).
+
+# Типы еды
+class FoodType(Enum):
+    NORMAL = 1
+    BONUS = 2
+    SPEED = 3
+    SLOW = 4
+
+class Config:
+    # Цвета
+    WHITE = (255, 255, 255)
+    BLACK = (0, 0, 0)
+    RED = (255, 0, 0)
+    GREEN = (0, 255, 0)
+    BLUE = (0, 0, 255)
+    GRAY = (200, 200, 200)
+    YELLOW = (255, 255, 0)
+    PURPLE = (128, 0, 128)
+    ORANGE = (255, 165, 0)
+    GOLD = (255, 215, 0)  # Новый цвет для счета
+
+    # Настройки экрана
+    WIDTH, HEIGHT = 800, 600
+    GRID_SIZE = 20
+    GRID_WIDTH = WIDTH // GRID_SIZE
+    GRID_HEIGHT = HEIGHT // GRID_SIZE
+
+    # Размер поля в клетках; может быть больше экрана (до 2000x2000),
+    # тогда камера показывает окрестность головы
+    BOARD_WIDTH = GRID_WIDTH
+    BOARD_HEIGHT = GRID_HEIGHT
+    MAX_BOARD_SIZE = 2000
+    CAMERA_MARGIN = 5           # отступ головы от края экрана до сдвига камеры
+
+    # Настройки игры
+    FPS = 60
+    INPUT_QUEUE_SIZE = 3        # сколько поворотов можно нажать впрок
+    MAX_TICKS_PER_FRAME = 5     # предел догоняющих тиков за один кадр
+    INITIAL_SPEED = 8
+    SPEED_INCREMENT = 1
+    SCORE_FILE = "highscores.json"   # старый формат, переносится в базу
+    SCORE_STORE = "sqlite:highscores.db"
+    SCORE_BATCH_SIZE = 100      # сколько рекордов копить до записи пачкой
+    JSON_SCORE_LIMIT = 1000     # сколько записей хранит JSON-хранилище
+    IO_QUEUE_SIZE = 256         # длина очереди фоновой записи на диск
+
+    # Профайлер кадра (F3 - оверлей, F4 - сохранить трассу)
+    PROFILE_BUFFER_SIZE = 8192  # фаз в кольцевом буфере
+    PROFILE_FRAMES = 600        # кадров для p50/p99
+    TRACE_FILE = "profile_trace.json"
+    SOUND_CACHE_DIR = ".sound_cache"
+    REPLAY_DIR = "replays"
+    REPLAY_SEEK_TICKS = 50      # шаг перемотки записи стрелками
+    REPLAY_MAX_TICKS = 1_000_000  # длиннее записи не проверяем (больше суток игры)
+
+    # Вероятности появления разных типов еды
+    FOOD_PROBABILITIES = {
+        FoodType.NORMAL: 0.7,   # 70%
+        FoodType.BONUS: 0.2,    # 20%
+        FoodType.SPEED: 0.05,   # 5%
+        FoodType.SLOW: 0.05     # 5%
+    }
+
+    # Цвета разных типов еды
+    FOOD_COLORS = {
+        FoodType.NORMAL: RED,
+        FoodType.BONUS: YELLOW,
+        FoodType.SPEED: BLUE,
+        FoodType.SLOW: PURPLE
+    }
+
+    # Очки за разные типы еды
+    FOOD_SCORES = {
+        FoodType.NORMAL: 10,
+        FoodType.BONUS: 30,
+        FoodType.SPEED: 15,
+        FoodType.SLOW: 15
+    }
+
+    # Длительность эффектов (в тиках)
+    EFFECT_DURATION = 150
+
+    # Время жизни особой еды (в тиках, 5 секунд на начальной скорости)
+    FOOD_LIFETIME = 40
+
+    # Сколько клеток поля расстояний автопилот достраивает за одно решение
+    AUTOPILOT_EXPANSION = 5000
+
+    # Сетевая игра: порт сервера, тиков в секунду в комнате, предел
+    # неотправленных байт клиенту (медленный клиент отключается) и как
+    # часто сервер печатает задержки тиков (в секундах)
+    NET_PORT = 5555
+    NET_TICK_RATE = 8
+    NET_MAX_BUFFER = 1 << 20
+    NET_REPORT_SECONDS = 10
+
+    # Ограничение длины безголовой партии (в тиках)
+    HEADLESS_MAX_TICKS = 10000
+
+class Board:
+    # Сетка занятости поля: один байт на клетку, проверки за O(1).
+    # Рядом хранится индекс свободных клеток (массив с удалением
+    # перестановкой с последним и карта позиций), чтобы ставить еду
+    # и препятствия за O(1) при любой заполненности поля.
+    # Клетки внутри движка упакованы в одно число: y * width + x.
+    EMPTY = 0
+    SNAKE = 1
+    OBSTACLE = 2
+    FOOD = 3
+
+    __slots__ = ('width', 'height', 'cells', 'free', 'free_slot')
+
+    def __init__(self, width=None, height=None):
+        self.width = width or Config.BOARD_WIDTH
+        self.height = height or Config.BOARD_HEIGHT
+        size = self.width * self.height
+        self.cells = bytearray(size)
+        # Для полей до 65536 клеток хватает двухбайтовых индексов
+        typecode = 'H' if size <= 0x10000 else 'i'
+        self.free = array(typecode, range(size))
+        self.free_slot = array(typecode, range(size))
+
+    def index(self, position):
+        return position[1] * self.width + position[0]
+
+    def position(self, index):
+        return (index % self.width, index // self.width)
+
+    def get(self, position):
+        return self.cells[position[1] * self.width + position[0]]
+
+    def set(self, position, value):
+        self.set_cell(position[1] * self.width + position[0], value)
+
+    def set_cell(self, index, value):
+        old = self.cells[index]
+        if old == value:
+            return
+        if old == Board.EMPTY:
+            # Клетка занята: на ее место в индексе ставим последнюю
+            free, free_slot = self.free, self.free_slot
+            slot = free_slot[index]
+            last = free[-1]
+            free[slot] = last
+            free_slot[last] = slot
+            free.pop()
+        elif value == Board.EMPTY:
+            self.free_slot[index] = len(self.free)
+            self.free.append(index)
+        self.cells[index] = value
+
+    def is_free(self, position):
+        return self.cells[position[1] * self.width + position[0]] == Board.EMPTY
+
+    def free_count(self):
+        return len(self.free)
+
+    def random_free_cell(self, rng=random):
+        # Случайная свободная клетка (упакованная) или None, если поле заполнено
+        if not self.free:
+            return None
+        return self.free[rng.randrange(len(self.free))]
+
+    def random_free(self, rng=random):
+        index = self.random_free_cell(rng)
+        return None if index is None else self.position(index)
+
+class Obstacle:
+    __slots__ = ('positions', 'color')
+
+    def __init__(self, board, rng=random):
+        self.positions = self.generate_obstacle(board, rng)
+        self.color = Config.BLACK
+
+    def generate_obstacle(self, board, rng=random):
+        # Генерируем простой барьер из 3-5 блоков от случайной свободной
+        # клетки вправо, пока клетки свободны
+        length = rng.randint(3, 5)
+        start = board.random_free(rng)
+        if start is None:
+            return []
+
+        positions = []
+        for i in range(length):
+            pos = ((start[0] + i) % board.width, start[1])
+            if not board.is_free(pos):
+                break
+            board.set(pos, Board.OBSTACLE)
+            positions.append(pos)
+
+        return positions
+
+class ObstacleMap:
+    # Клетки препятствий, разложенные по квадратным чанкам, чтобы
+    # отрисовка выбирала только то, что попадает в окно камеры
+    CHUNK_SIZE = 16
+
+    __slots__ = ('width', 'chunks', 'count', 'last_added')
+
+    def __init__(self, width):
+        self.width = width
+        self.chunks = {}
+        self.count = 0
+        self.last_added = []
+
+    def add(self, obstacle):
+        size = self.CHUNK_SIZE
+        for x, y in obstacle.positions:
+            key = (x // size, y // size)
+            cells = self.chunks.get(key)
+            if cells is None:
+                cells = self.chunks[key] = array('i')
+            cells.append(y * self.width + x)
+        self.count += len(obstacle.positions)
+        self.last_added = obstacle.positions
+
+    def cells_in_rect(self, x0, y0, x1, y1):
+        # Клетки в прямоугольнике [x0, x1) x [y0, y1)
+        size = self.CHUNK_SIZE
+        width = self.width
+        for cy in range(y0 // size, (y1 - 1) // size + 1):
+            for cx in range(x0 // size, (x1 - 1) // size + 1):
+                for cell in self.chunks.get((cx, cy), ()):
+                    x, y = cell % width, cell // width
+                    if x0 <= x < x1 and y0 <= y < y1:
+                        yield (x, y)
+
+    def __iter__(self):
+        width = self.width
+        for cells in self.chunks.values():
+            for cell in cells:
+                yield (cell % width, cell // width)
+
+    def __len__(self):
+        return self.count
+
+class Food:
+    # Таблица выбора типа еды считается один раз. Выбор повторяет
+    # rng.choices(типы, weights=веса): тот же вызов rng.random() и та же
+    # таблица накопленных весов, поэтому записи партий остаются верными,
+    # но списки на каждый выбор не создаются
+    TYPES = tuple(Config.FOOD_PROBABILITIES)
+    CUM_WEIGHTS = tuple(accumulate(Config.FOOD_PROBABILITIES.values()))
+    TOTAL_WEIGHT = CUM_WEIGHTS[-1] + 0.0
+
+    __slots__ = ('food_type', 'cell', 'width', 'color', 'spawn_tick', 'lifetime')
+
+    def __init__(self, board, rng=random, tick=0):
+        self.respawn(board, rng, tick)
+
+    def respawn(self, board, rng=random, tick=0):
+        # Новая еда в том же объекте (Simulation переиспользует пару объектов)
+        self.width = board.width
+        self.food_type = self.choose_food_type(rng)
+        self.cell = self.randomize_position(board, rng)
+        if self.cell is not None:
+            board.set_cell(self.cell, Board.FOOD)
+        self.color = self.get_color()
+        self.spawn_tick = tick
+        self.lifetime = Config.FOOD_LIFETIME  # Время жизни бонусной еды
+
+    @property
+    def position(self):
+        if self.cell is None:
+            return None
+        return (self.cell % self.width, self.cell // self.width)
+
+    @classmethod
+    def choose_food_type(cls, rng=random):
+        types = cls.TYPES
+        return types[bisect(cls.CUM_WEIGHTS, rng.random() * cls.TOTAL_WEIGHT, 0, len(types) - 1)]
+
+    def get_color(self):
+        return Config.FOOD_COLORS[self.food_type]
+
+    def randomize_position(self, board, rng=random):
+        # None означает, что свободных клеток нет (поле заполнено)
+        return board.random_free_cell(rng)
+
+    def remove(self, board):
+        # Убираем несъеденную еду с поля
+        if self.cell is not None and board.cells[self.cell] == Board.FOOD:
+            board.set_cell(self.cell, Board.EMPTY)
+
+    def is_expired(self, tick):
+        if self.food_type != FoodType.NORMAL:
+            return tick - self.spawn_tick > self.lifetime
+        return False
+
+class SnakeBody:
+    # Кольцевой буфер упакованных клеток: голова в начале, хвост в конце.
+    # Снаружи ведет себя как последовательность координат (x, y).
+    __slots__ = ('width', 'cells', 'start', 'length')
+
+    def __init__(self, board, capacity=16):
+        self.width = board.width
+        self.cells = array(board.free.typecode, [0]) * capacity
+        self.start = 0
+        self.length = 0
+
+    def appendleft(self, cell):
+        if self.length == len(self.cells):
+            self.grow()
+        self.start = (self.start - 1) % len(self.cells)
+        self.cells[self.start] = cell
+        self.length += 1
+
+    def pop(self):
+        self.length -= 1
+        return self.cells[(self.start + self.length) % len(self.cells)]
+
+    def grow(self):
+        # Разворачиваем кольцо и удваиваем емкость
+        cells, start = self.cells, self.start
+        self.cells = cells[start:] + cells[:start] + array(cells.typecode, [0]) * len(cells)
+        self.start = 0
+
+    def head_cell(self):
+        return self.cells[self.start]
+
+    def tail_cell(self):
+        return self.cells[(self.start + self.length - 1) % len(self.cells)]
+
+    def iter_cells(self):
+        cells, start, capacity = self.cells, self.start, len(self.cells)
+        for i in range(self.length):
+            yield cells[(start + i) % capacity]
+
+    def __iter__(self):
+        width = self.width
+        for cell in self.iter_cells():
+            yield (cell % width, cell // width)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError('индекс вне змейки')
+        cell = self.cells[(self.start + i) % len(self.cells)]
+        return (cell % self.width, cell // self.width)
+
+class Snake:
+    __slots__ = ('board', 'start', 'positions', 'direction', 'pending_growth', 'added_head',
+                 'removed_tail', 'collision', 'color', 'clock', 'effect_until', 'slow_skip')
+
+    def __init__(self, board, start=None):
+        self.board = board
+        self.start = start  # начальная клетка (упакованная), по умолчанию - центр поля
+        self.reset()
+
+    def reset(self):
+        board = self.board
+        if hasattr(self, 'positions'):
+            for cell in self.positions.iter_cells():
+                board.set_cell(cell, Board.EMPTY)
+        self.positions = SnakeBody(board)
+        start = self.start
+        if start is None:
+            start = board.index((board.width // 2, board.height // 2))
+        self.positions.appendleft(start)
+        board.set_cell(self.positions.head_cell(), Board.SNAKE)
+        self.direction = (1, 0)
+        self.pending_growth = 0
+        # Изменения за последний тик: добавленная голова и убранный хвост
+        # (упакованные клетки или None, если клетки не менялись), для
+        # инкрементальной отрисовки
+        self.added_head = None
+        self.removed_tail = None
+        # Во что врезалась змейка (Board.SNAKE или Board.OBSTACLE)
+        self.collision = Board.EMPTY
+        self.color = Config.GREEN
+        # Эффекты - постоянные ячейки с тиком окончания по часам змейки
+        # (тик, на котором эффект уже не действует): за ход меняются только
+        # часы, а не счетчики каждого эффекта
+        self.clock = 0
+        self.effect_until = {'speed': 0, 'slow': 0}
+        self.slow_skip = False
+
+    def add_effect(self, effect_type, duration):
+        self.effect_until[effect_type] = self.clock + duration
+
+    @property
+    def effects(self):
+        # Действующие эффекты и сколько тиков им осталось
+        return {effect: until - self.clock for effect, until in self.effect_until.items()
+                if until > self.clock}
+
+    def has_effect(self, effect_type):
+        return self.clock < self.effect_until[effect_type]
+
+    def get_head_position(self):
+        return self.positions[0]
+
+    def get_tail_position(self):
+        return self.positions[-1]
+
+    def move(self):
+        self.added_head = None
+        self.removed_tail = None
+
+        # Замедление: змейка ходит через тик (раньше int(0.5) давал
+        # нулевой шаг, и тело схлопывалось в голову)
+        speed = self.clock < self.effect_until['speed']
+        if self.clock < self.effect_until['slow'] and not speed:
+            self.slow_skip = not self.slow_skip
+            if self.slow_skip:
+                self.clock += 1
+                return True
+
+        board = self.board
+        width = board.width
+        head = self.positions.head_cell()
+        head_x, head_y = head % width, head // width
+        dir_x, dir_y = self.direction
+
+        # Учет эффекта скорости
+        if speed:
+            dir_x *= 2
+            dir_y *= 2
+
+        new_x = (head_x + dir_x) % width
+        new_y = (head_y + dir_y) % board.height
+        new_head = new_y * width + new_x
+
+        # Столкновение с собой или с препятствием: клетка уже занята
+        # (хвост тоже считается занятым, как и раньше)
+        cell = board.cells[new_head]
+        if cell != Board.EMPTY and cell != Board.FOOD:
+            self.collision = cell
+            return False
+
+        self.positions.appendleft(new_head)
+        if self.pending_growth:
+            self.pending_growth -= 1
+        else:
+            tail = self.positions.pop()
+            board.set_cell(tail, Board.EMPTY)
+            self.removed_tail = tail
+        board.set_cell(new_head, Board.SNAKE)
+        self.added_head = new_head
+
+        self.clock += 1
+        return True
+
+    def change_direction(self, new_direction):
+        if (new_direction[0] * -1, new_direction[1] * -1) != self.direction:
+            self.direction = new_direction
+
+    def grow_snake(self, amount=1):
+        self.pending_growth += amount
+
+class StepResult:
+    # Результат одного тика: очки за тик, события ('eat', 'bonus', 'effect',
+    # 'level_up', 'food_expired', 'game_over', 'win') и признак конца партии.
+    # Simulation возвращает один и тот же объект каждый тик, поэтому он
+    # действителен только до следующего step
+    __slots__ = ('reward', 'events', 'done')
+
+    def __init__(self):
+        self.reward = 0
+        self.events = []
+        self.done = False
+
+class Simulation:
+    __slots__ = ('width', 'height', 'seed', 'rng', 'board', 'snake', 'obstacles', 'tick',
+                 'food', 'spare_food', 'score', 'speed', 'level', 'done', 'won', 'death_cause',
+                 'profiler', 'result')
+
+    def __init__(self, seed=None, width=None, height=None):
+        self.width = width
+        self.height = height
+        self.profiler = None  # profiler.Profiler, если нужны замеры фаз тика
+        self.result = StepResult()
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.board = Board(self.width, self.height)
+        self.snake = Snake(self.board)
+        self.obstacles = ObstacleMap(self.board.width)
+        for _ in range(3):
+            self.obstacles.add(Obstacle(self.board, self.rng))
+        self.tick = 0
+        self.food = Food(self.board, self.rng, self.tick)
+        self.spare_food = None
+        self.score = 0
+        self.speed = Config.INITIAL_SPEED
+        self.level = 1
+        self.done = False
+        self.won = False
+        self.death_cause = None  # 'self', 'obstacle' или 'win'
+
+    def step(self, action=None):
+        result = self.result
+        events = result.events
+        events.clear()
+        result.reward = 0
+        result.done = self.done
+        if self.done:
+            return result
+
+        if action is not None:
+            self.snake.change_direction(action)
+
+        self.tick += 1
+
+        # Движение змейки (вместе с проверкой столкновений по сетке)
+        profiler = self.profiler
+        if profiler:
+            started = profiler.start()
+        moved = self.snake.move()
+        if profiler:
+            profiler.stop('move', started)
+        if not moved:
+            self.done = True
+            self.death_cause = 'self' if self.snake.collision == Board.SNAKE else 'obstacle'
+            events.append('game_over')
+            result.done = True
+            return result
+
+        if profiler:
+            started = profiler.start()
+
+        # Проверка на съедание еды
+        if self.snake.positions.head_cell() == self.food.cell:
+            result.reward = self.handle_food_collision(events)
+
+        # Проверка на истечение времени жизни еды
+        if self.food.is_expired(self.tick):
+            self.food.remove(self.board)
+            self.spawn_food()
+            events.append('food_expired')
+
+        # Еду некуда поставить: поле заполнено, это победа
+        if self.food.cell is None:
+            self.done = True
+            self.won = True
+            self.death_cause = 'win'
+            events.append('win')
+
+        if profiler:
+            profiler.stop('food', started)
+        result.done = self.done
+        return result
+
+    def spawn_food(self):
+        # Еда чередуется в паре объектов: прежний объект не трогается до
+        # следующей смены еды, так что окно успевает сравнить его с новым
+        food = self.spare_food
+        self.spare_food = self.food
+        if food is None:
+            self.food = Food(self.board, self.rng, self.tick)
+        else:
+            food.respawn(self.board, self.rng, self.tick)
+            self.food = food
+
+    def handle_food_collision(self, events):
+        score = Config.FOOD_SCORES[self.food.food_type]
+        self.score += score
+
+        if self.food.food_type == FoodType.BONUS:
+            events.append('bonus')
+        else:
+            events.append('eat')
+
+        # Обработка эффектов еды
+        if self.food.food_type == FoodType.SPEED:
+            self.snake.add_effect('speed', Config.EFFECT_DURATION)
+            events.append('effect')
+        elif self.food.food_type == FoodType.SLOW:
+            self.snake.add_effect('slow', Config.EFFECT_DURATION)
+            events.append('effect')
+
+        self.snake.grow_snake()
+        self.spawn_food()
+
+        # Увеличение уровня каждые 50 очков
+        if self.score % 50 == 0:
+            self.speed += Config.SPEED_INCREMENT
+            self.level += 1
+            events.append('level_up')
+            # Добавляем новое препятствие каждый уровень
+            if self.level % 2 == 0:
+                self.obstacles.add(Obstacle(self.board, self.rng))
+
+        return score
+
+    def get_state(self):
+        return {
+            'tick': self.tick,
+            'snake': list(self.snake.positions),
+            'direction': self.snake.direction,
+            'effects': self.snake.effects,
+            'food': (self.food.position, self.food.food_type),
+            'obstacles': list(self.obstacles),
+            'score': self.score,
+            'level': self.level,
+            'speed': self.speed,
+            'done': self.done,
+            'won': self.won,
+        }
+
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+def random_agent(sim, rng):
+    # Простейший бот: иногда поворачивает в случайную сторону
+    if rng.random() < 0.1:
+        return rng.choice(DIRECTIONS)
+    return None
+
+def greedy_agent(sim, rng):
+    # Жадный бот: шаг к еде по кратчайшему пути с учетом заворота поля,
+    # не заходя в занятые клетки
+    food = sim.food.position
+    if food is None:
+        return None
+    board = sim.board
+    head_x, head_y = sim.snake.get_head_position()
+    best, best_distance = None, None
+    for dx, dy in DIRECTIONS:
+        if (-dx, -dy) == sim.snake.direction:
+            continue
+        x, y = (head_x + dx) % board.width, (head_y + dy) % board.height
+        cell = board.get((x, y))
+        if cell != Board.EMPTY and cell != Board.FOOD:
+            continue
+        distance_x = abs(x - food[0])
+        distance_y = abs(y - food[1])
+        distance = (min(distance_x, board.width - distance_x) +
+                    min(distance_y, board.height - distance_y))
+        if best_distance is None or distance < best_distance:
+            best, best_distance = (dx, dy), distance
+    return best
+
+def run_headless(games, seed=None, agent=random_agent, max_ticks=Config.HEADLESS_MAX_TICKS,
+                 width=None, height=None):
+    rng = random.Random(seed)
+    results = []
+    total_ticks = 0
+    started = time.perf_counter()
+
+    for _ in range(games):
+        sim = Simulation(rng.getrandbits(32), width, height)
+        while not sim.done and sim.tick < max_ticks:
+            sim.step(agent(sim, rng))
+        results.append((sim.score, len(sim.snake.positions), sim.level, sim.tick))
+        total_ticks += sim.tick
+
+    elapsed = time.perf_counter() - started
+    return results, total_ticks, elapsed
@@ -1,323 +1,348 @@
+import time
+
+from profiler import StartupTimer
+
+# Отметки запуска для --profile-startup, отсчет - с начала импорта main.py.
+# Модули, нужные только отдельным командам (network, tournament) или
+# фоновому потоку (scores), импортируются там, где используются.
+startup = StartupTimer()
+
 import pygame
+startup.mark('импорт pygame')
 import random
-import time
-import json
 import os
-from enum import Enum
+import argparse
+import tempfile
+from collections import deque
 
-# Типы еды
-class FoodType(Enum):
-    NORMAL = 1
-    BONUS = 2
-    SPEED = 3
-    SLOW = 4
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
-class Config:
-    # Цвета
-    WHITE = (255, 255, 255)
-    BLACK = (0, 0, 0)
-    RED = (255, 0, 0)
-    GREEN = (0, 255, 0)
-    BLUE = (0, 0, 255)
-    GRAY = (200, 200, 200)
-    YELLOW = (255, 255, 0)
-    PURPLE = (128, 0, 128)
-    ORANGE = (255, 165, 0)
-    GOLD = (255, 215, 0)  # Новый цвет для счета
-    
-    # Настройки экрана
-    WIDTH, HEIGHT = 800, 600
-    GRID_SIZE = 20
-    GRID_WIDTH = WIDTH // GRID_SIZE
-    GRID_HEIGHT = HEIGHT // GRID_SIZE
-    
-    # Настройки игры
-    FPS = 60
-    INITIAL_SPEED = 8
-    SPEED_INCREMENT = 1
-    SCORE_FILE = "highscores.json"
-    
-    # Вероятности появления разных типов еды
-    FOOD_PROBABILITIES = {
-        FoodType.NORMAL: 0.7,   # 70%
-        FoodType.BONUS: 0.2,    # 20%
-        FoodType.SPEED: 0.05,   # 5%
-        FoodType.SLOW: 0.05     # 5%
-    }
-    
-    # Очки за разные типы еды
-    FOOD_SCORES = {
-        FoodType.NORMAL: 10,
-        FoodType.BONUS: 30,
-        FoodType.SPEED: 15,
-        FoodType.SLOW: 15
-    }
-    
-    # Длительность эффектов (в кадрах)
-    EFFECT_DURATION = 150
+import replay
+from arena import RemoteState
+from autopilot import Autopilot
+from background import BackgroundWriter
+from profiler import Profiler
+from engine import Board, Config, FoodType, Simulation, run_headless
+startup.mark('импорт модулей игры')
 
 class SoundManager:
-    def __init__(self):
+    # Звуки эффектов: частоты аккорда (Гц), длительность (с),
+    # атака и затухание огибающей (доля длительности)
+    SOUND_SPECS = {
+        'eat': ((440,), 0.1, 0.05, 0.5),
+        'bonus': ((880, 1108.73, 1318.51), 0.2, 0.05, 0.6),   # мажорный аккорд
+        'game_over': ((220, 261.63, 329.63), 0.5, 0.02, 0.9),  # минорный аккорд
+        'effect': ((660, 990), 0.3, 0.1, 0.5),                 # квинта
+    }
+    AMPLITUDE = 4096
+    SAMPLE_RATE = 44100
+    
+    def __init__(self, prepared=None):
+        # prepared - результат prepare_buffers, посчитанный заранее
+        # (например, в фоновом потоке)
         self.sounds = {}
-        self.load_sounds()
+        self.load_sounds(prepared)
         
-    def load_sounds(self):
+    def load_sounds(self, prepared=None):
+        if numpy is None:
+            print("Звук недоступен: не установлен numpy")
+            return
         try:
             # Создаем простые звуки программно, если нет файлов
-            self.create_default_sounds()
+            self.create_default_sounds(prepared)
         except Exception as e:
             print(f"Ошибка загрузки звуков: {e}")
     
-    def create_default_sounds(self):
-        # Создаем простые звуковые эффекты
-        self.sounds['eat'] = pygame.mixer.Sound(self.generate_beep(440, 0.1))
-        self.sounds['bonus'] = pygame.mixer.Sound(self.generate_beep(880, 0.2))
-        self.sounds['game_over'] = pygame.mixer.Sound(self.generate_beep(220, 0.5))
-        self.sounds['effect'] = pygame.mixer.Sound(self.generate_beep(660, 0.3))
+    def create_default_sounds(self, prepared=None):
+        # Создаем простые звуковые эффекты; буферы под другую частоту
+        # микшера считаются заново
+        sample_rate, _, channels = pygame.mixer.get_init()
+        if prepared is None or prepared[0] != sample_rate:
+            prepared = self.prepare_buffers(sample_rate)
+        for name, buf in prepared[1].items():
+            if channels > 1:
+                buf = numpy.repeat(buf[:, None], channels, axis=1)
+            self.sounds[name] = pygame.sndarray.make_sound(numpy.ascontiguousarray(buf))
     
-    def generate_beep(self, frequency, duration):
-        sample_rate = 44100
-        amplitude = 4096
+    @classmethod
+    def prepare_buffers(cls, sample_rate):
+        # Моно-буферы всех звуков: только numpy и диск, без вызовов SDL,
+        # поэтому можно звать из фонового потока
+        buffers = {}
+        for name, (frequencies, duration, attack, release) in cls.SOUND_SPECS.items():
+            buffers[name] = cls.load_cached(frequencies, duration, sample_rate, attack, release)
+        return sample_rate, buffers
+    
+    @classmethod
+    def load_cached(cls, frequencies, duration, sample_rate, attack, release):
+        # Готовые буферы лежат на диске, ключ - частоты, длительность,
+        # частота дискретизации и огибающая
+        key = '-'.join(f'{f:g}' for f in frequencies)
+        name = f'{key}_{duration:g}_{sample_rate}_{attack:g}-{release:g}.npy'
+        path = os.path.join(Config.SOUND_CACHE_DIR, name)
+        try:
+            return numpy.load(path)
+        except (OSError, ValueError, EOFError):
+            pass  # нет в кэше или файл испорчен - считаем заново
+        
+        buf = cls.generate_beep(frequencies, duration, sample_rate, attack, release)
+        # Пишем через временный файл и os.replace: оборванная запись (диск
+        # полон, игру закрыли, параллельный запуск) не оставит в кэше обрезок
+        try:
+            os.makedirs(Config.SOUND_CACHE_DIR, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=Config.SOUND_CACHE_DIR, suffix='.tmp')
+        except OSError:
+            return buf
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                numpy.save(f, buf)
+            os.replace(temp_path, path)
+        except OSError:
+            os.unlink(temp_path)
+        return buf
+    
+    @classmethod
+    def generate_beep(cls, frequencies, duration, sample_rate=44100, attack=0.05, release=0.5):
+        # Все сэмплы считаются разом на массивах numpy
         n_samples = int(round(duration * sample_rate))
+        t = numpy.arange(n_samples) / sample_rate
         
-        buf = numpy.zeros((n_samples, 2), dtype=numpy.int16)
-        for s in range(n_samples):
-            t = float(s) / sample_rate
-            buf[s][0] = amplitude * math.sin(2 * math.pi * frequency * t)
-            buf[s][1] = amplitude * math.sin(2 * math.pi * frequency * t)
+        wave = numpy.zeros(n_samples)
+        for frequency in frequencies:
+            wave += numpy.sin(2 * numpy.pi * frequency * t)
+        wave /= len(frequencies)
         
-        return pygame.sndarray.make_sound(buf)
+        # Огибающая: линейная атака в начале и затухание в конце,
+        # чтобы не было щелчков
+        envelope = numpy.ones(n_samples)
+        n_attack = max(int(n_samples * attack), 1)
+        n_release = max(int(n_samples * release), 1)
+        envelope[:n_attack] = numpy.linspace(0, 1, n_attack)
+        envelope[-n_release:] = numpy.minimum(envelope[-n_release:], numpy.linspace(1, 0, n_release))
+        
+        return (cls.AMPLITUDE * wave * envelope).astype(numpy.int16)
     
     def play(self, sound_name):
         if sound_name in self.sounds:
             self.sounds[sound_name].play()
 
-class Obstacle:
-    def __init__(self, snake_positions):
-        self.positions = self.generate_obstacle(snake_positions)
-        self.color = Config.BLACK
-        
-    def generate_obstacle(self, snake_positions):
-        # Генерируем простой барьер из 3-5 блоков
-        length = random.randint(3, 5)
-        start_x = random.randint(5, Config.GRID_WIDTH - length - 5)
-        start_y = random.randint(5, Config.GRID_HEIGHT - 5)
-        
-        positions = []
-        for i in range(length):
-            pos = (start_x + i, start_y)
-            if pos not in snake_positions:
-                positions.append(pos)
-        
-        return positions
-    
-    def draw(self, surface):
-        for position in self.positions:
-            rect = pygame.Rect(
-                position[0] * Config.GRID_SIZE, 
-                position[1] * Config.GRID_SIZE, 
-                Config.GRID_SIZE, Config.GRID_SIZE
-            )
-            pygame.draw.rect(surface, self.color, rect)
-            pygame.draw.rect(surface, Config.BLACK, rect, 2)  # Более толстая обводка
-
-class Food:
-    def __init__(self, snake_positions, obstacles):
-        self.food_type = self.choose_food_type()
-        self.position = self.randomize_position(snake_positions, obstacles)
-        self.color = self.get_color()
-        self.spawn_time = pygame.time.get_ticks()
-        self.lifetime = 5000  # 5 секунд для бонусной еды
-        
-    def choose_food_type(self):
-        return random.choices(
-            list(Config.FOOD_PROBABILITIES.keys()),
-            weights=list(Config.FOOD_PROBABILITIES.values())
-        )[0]
-    
-    def get_color(self):
-        colors = {
-            FoodType.NORMAL: Config.RED,
-            FoodType.BONUS: Config.YELLOW,
-            FoodType.SPEED: Config.BLUE,
-            FoodType.SLOW: Config.PURPLE
-        }
-        return colors[self.food_type]
-    
-    def randomize_position(self, snake_positions, obstacles):
-        while True:
-            position = (
-                random.randint(0, Config.GRID_WIDTH - 1),
-                random.randint(0, Config.GRID_HEIGHT - 1)
-            )
-            if (position not in snake_positions and 
-                not any(position in obs.positions for obs in obstacles)):
-                return position
-    
-    def is_expired(self):
-        if self.food_type != FoodType.NORMAL:
-            return pygame.time.get_ticks() - self.spawn_time > self.lifetime
-        return False
-    
-    def draw(self, surface):
-        rect = pygame.Rect(
-            self.position[0] * Config.GRID_SIZE, 
-            self.position[1] * Config.GRID_SIZE, 
-            Config.GRID_SIZE, Config.GRID_SIZE
-        )
-        pygame.draw.rect(surface, self.color, rect)
-        pygame.draw.rect(surface, Config.BLACK, rect, 2)  # Более толстая обводка
-        
-        # Анимация мигания для бонусной еды
-        if self.food_type != FoodType.NORMAL:
-            if (pygame.time.get_ticks() // 200) % 2 == 0:
-                inner_rect = pygame.Rect(
-                    rect.x + 4, rect.y + 4,
-                    Config.GRID_SIZE - 8, Config.GRID_SIZE - 8
-                )
-                pygame.draw.rect(surface, Config.WHITE, inner_rect)
-
-class Snake:
-    def __init__(self):
-        self.reset()
-        
-    def reset(self):
-        self.positions = [(Config.GRID_WIDTH // 2, Config.GRID_HEIGHT // 2)]
-        self.direction = (1, 0)
-        self.grow = False
-        self.color = Config.GREEN
-        self.effects = {}
-        
-    def add_effect(self, effect_type, duration):
-        self.effects[effect_type] = duration
-        
-    def update_effects(self):
-        for effect in list(self.effects.keys()):
-            self.effects[effect] -= 1
-            if self.effects[effect] <= 0:
-                del self.effects[effect]
-    
-    def has_effect(self, effect_type):
-        return effect_type in self.effects
-    
-    def get_head_position(self):
-        return self.positions[0]
-    
-    def move(self, obstacles):
-        head_x, head_y = self.get_head_position()
-        dir_x, dir_y = self.direction
-        
-        # Учет эффекта скорости
-        speed_multiplier = 2 if self.has_effect('speed') else 0.5 if self.has_effect('slow') else 1
-        if speed_multiplier != 1:
-            dir_x = int(dir_x * speed_multiplier)
-            dir_y = int(dir_y * speed_multiplier)
-        
-        new_x = (head_x + dir_x) % Config.GRID_WIDTH
-        new_y = (head_y + dir_y) % Config.GRID_HEIGHT
-        
-        # Проверка на столкновение с собой
-        if (new_x, new_y) in self.positions[1:]:
-            return False
-            
-        # Проверка на столкновение с препятствиями
-        for obstacle in obstacles:
-            if (new_x, new_y) in obstacle.positions:
-                return False
-        
-        self.positions.insert(0, (new_x, new_y))
-        if not self.grow:
-            self.positions.pop()
-        else:
-            self.grow = False
-            
-        self.update_effects()
-        return True
+class Game:
+    # Область HUD в левом верхнем углу: при изменении счета или когда
+    # змейка проползает под текстом, она перерисовывается целиком. Под
+    # счетом и уровнем - до трех строк мелким шрифтом (два эффекта и
+    # повтор или автопилот); высоту области считает set_fonts по низу
+    # последней строки
+    HUD_WIDTH = 360
+    HUD_LINES_TOP = 100
+    HUD_LINE_STEP = 25
+    HUD_LINES = 3
     
-    def change_direction(self, new_direction):
-        if (new_direction[0] * -1, new_direction[1] * -1) != self.direction:
-            self.direction = new_direction
+    # Оверлей профайлера в правом верхнем углу
+    PROFILE_RECT = pygame.Rect(Config.WIDTH - 280, 0, 280, 130)
     
-    def grow_snake(self, amount=1):
-        self.grow = True
+    # Описание особенностей для меню
+    MENU_FEATURES = [
+        '• Разные типы еды с эффектами',
+        '• Препятствия на поле',
+        '• Система уровней сложности',
+        '• Топ-5 рекордов'
+    ]
     
-    def draw(self, surface):
-        for i, position in enumerate(self.positions):
-            rect = pygame.Rect(
-                position[0] * Config.GRID_SIZE, 
-                position[1] * Config.GRID_SIZE, 
-                Config.GRID_SIZE, Config.GRID_SIZE
-            )
-            
-            # Разные цвета для эффектов
-            if self.has_effect('speed'):
-                color = Config.BLUE
-            elif self.has_effect('slow'):
-                color = Config.PURPLE
-            else:
-                color = (0, 180, 0) if i == 0 else (0, 220, 0)  # Более насыщенные зеленые
-                
-            pygame.draw.rect(surface, color, rect)
-            # Более толстая обводка для лучшей видимости без сетки
-            pygame.draw.rect(surface, Config.BLACK, rect, 2)
-
-class Game:
-    def __init__(self):
+    # Сколько строк держать в кэше текста, прежде чем сбросить его
+    TEXT_CACHE_SIZE = 256
+    
+    def __init__(self, board_size=(None, None), record=False, replay=None, score_store=None,
+                 profile=False, startup=None):
+        self.startup = startup or StartupTimer()
+        self.board_size = board_size
+        self.profiler = Profiler()
+        self.profiler.enabled = profile
+        self.score_store_spec = score_store
+        self.record = record
+        self.replay = replay  # запись, которую показываем вместо игры
+        self.autopilot = Autopilot()
+        self.autopilot_enabled = False  # TAB - включить или выключить
         self.screen = pygame.display.set_mode((Config.WIDTH, Config.HEIGHT))
         pygame.display.set_caption('Змейка - Улучшенная версия')
         self.clock = pygame.time.Clock()
+        self.startup.mark('окно')
         
-        # Увеличенные шрифты
-        self.font = pygame.font.SysFont('Arial', 32)  # Было 24
-        self.big_font = pygame.font.SysFont('Arial', 56)  # Было 48
-        self.small_font = pygame.font.SysFont('Arial', 20)  # Было 16
+        # Кэш отрисованного текста и готовые спрайты клеток
+        self.text_cache = {}
+        self.sprites = {}
+        self.overlay = pygame.Surface((Config.WIDTH, Config.HEIGHT), pygame.SRCALPHA)
+        self.overlay.fill((0, 0, 0, 150))  # Более темный overlay
         
-        # Инициализация звука
-        try:
-            pygame.mixer.init()
-            self.sound_manager = SoundManager()
-        except:
-            self.sound_manager = None
-            print("Звук недоступен")
+        # Пока системный шрифт ищется в фоне, текст рисуется встроенным
+        self.set_fonts(None)
+        self.found_font = None
+        self.loaded_highscores = None
+        self.loaded_sounds = None
+        self.sound_manager = None
             
         self.reset_game()
-        self.load_highscores()
+        self.load_resources()
         
     def reset_game(self):
-        self.snake = Snake()
-        self.obstacles = [Obstacle(self.snake.positions) for _ in range(3)]
-        self.food = Food(self.snake.positions, self.obstacles)
-        self.score = 0
+        # Зерно известно заранее, чтобы партию можно было записать и повторить
+        if self.replay is not None:
+            self.seed = self.replay.seed
+            self.sim = Simulation(self.seed, self.replay.width, self.replay.height)
+        else:
+            self.seed = random.getrandbits(32)
+            self.sim = Simulation(self.seed, *self.board_size)
+        self.sim.profiler = self.profiler if self.profiler.enabled else None
+        self.recorder = None
+        if self.record:
+            self.recorder = replay.Recorder(self.seed, self.sim.board.width, self.sim.board.height)
         self.game_over = False
         self.paused = False
-        self.in_menu = True
-        self.speed = Config.INITIAL_SPEED
-        self.level = 1
+        self.in_menu = self.replay is None
         self.effect_timer = 0
         
-    def load_highscores(self):
+        # Состояние инкрементальной отрисовки
+        self.full_redraw = True
+        self.drawn_screen = None
+        self.dirty_cells = set()  # упакованные клетки поля, как в движке
+        self.hud_dirty = False
+        self.blink_phase = None
+        
+        # Очередь поворотов: нажатия между тиками применяются по одному за тик
+        self.input_queue = deque()
+        
+        # Интерполяция головы между тиками: прошлая клетка головы
+        # (упакованная), доля прошедшего тика и клетки, которые голова
+        # закрывала в прошлом кадре
+        self.prev_head = None
+        self.alpha = 1.0
+        self.interpolated_cells = []
+        
+        # Камера: клетка поля в левом верхнем углу экрана
+        self.camera = (0, 0)
+        self.update_camera(force=True)
+    
+    # Состояние партии живет в движке, окно только читает его
+    @property
+    def snake(self):
+        return self.sim.snake
+    
+    @property
+    def food(self):
+        return self.sim.food
+    
+    @property
+    def obstacles(self):
+        return self.sim.obstacles
+    
+    @property
+    def score(self):
+        return self.sim.score
+    
+    @property
+    def level(self):
+        return self.sim.level
+    
+    @property
+    def speed(self):
+        return self.sim.speed
+        
+    def load_resources(self):
+        # Меню показывается сразу, а шрифт, рекорды и звуки грузятся в
+        # фоновом потоке. Все обращения к диску идут через него же;
+        # хранилище создается там, потому что соединение SQLite привязано
+        # к потоку
         self.highscores = []
-        if os.path.exists(Config.SCORE_FILE):
-            try:
-                with open(Config.SCORE_FILE, 'r') as f:
-                    self.highscores = json.load(f)
-            except:
-                self.highscores = []
+        self.io = BackgroundWriter()
+        self.io.submit(self.find_font)
+        self.io.submit(self.open_scores)
+        self.io.submit(self.load_sounds)
+    
+    def set_fonts(self, path):
+        # Увеличенные шрифты (path=None - встроенный шрифт pygame)
+        self.font = pygame.font.Font(path, 32)  # Было 24
+        self.big_font = pygame.font.Font(path, 56)  # Было 48
+        self.small_font = pygame.font.Font(path, 20)  # Было 16
+        hud_bottom = (self.HUD_LINES_TOP + (self.HUD_LINES - 1) * self.HUD_LINE_STEP +
+                      self.small_font.get_linesize())
+        self.hud_rect = pygame.Rect(0, 0, self.HUD_WIDTH, hud_bottom)
+        self.text_cache.clear()
+        self.full_redraw = True
+    
+    def find_font(self):
+        # Поиск системного шрифта (с запуском fc-list) бывает долгим;
+        # сам шрифт создает главный поток в apply_loaded
+        self.found_font = pygame.font.match_font('Arial')
+        self.startup.mark('поиск шрифта')
+    
+    def load_sounds(self):
+        # В фоне только синтез или чтение буферов из кэша; микшер и объекты
+        # Sound создает главный поток в apply_loaded - SDL не обещает, что
+        # звать его из двух потоков сразу безопасно
+        if numpy is None:
+            self.loaded_sounds = (SoundManager.SAMPLE_RATE, None)
+        else:
+            self.loaded_sounds = SoundManager.prepare_buffers(SoundManager.SAMPLE_RATE)
+        self.startup.mark('звуки')
+    
+    def init_sound(self, prepared):
+        try:
+            pygame.mixer.init(frequency=prepared[0])
+            self.sound_manager = SoundManager(prepared)
+        except Exception:
+            print("Звук недоступен")
+        self.startup.mark('микшер')
+    
+    def apply_loaded(self):
+        # Подхватываем то, что фоновый поток загрузил к этому кадру
+        if self.found_font is not None:
+            self.set_fonts(self.found_font)
+            self.found_font = None
+        if self.loaded_highscores is not None:
+            self.highscores = self.loaded_highscores
+            self.loaded_highscores = None
+            self.full_redraw = True  # меню покажет загруженные рекорды
+        if self.loaded_sounds is not None:
+            self.init_sound(self.loaded_sounds)
+            self.loaded_sounds = None
+    
+    def open_scores(self):
+        from scores import open_score_store
+        self.score_store = open_score_store(self.score_store_spec)
+        # Рекорды и перерисовку меню применяет главный поток в apply_loaded
+        self.loaded_highscores = self.score_store.top_scores(5)
+        self.startup.mark('рекорды')
     
     def save_highscore(self, score):
-        self.highscores.append(score)
-        self.highscores.sort(reverse=True)
-        self.highscores = self.highscores[:5]
-        
-        with open(Config.SCORE_FILE, 'w') as f:
-            json.dump(self.highscores, f)
+        # Сразу показываем рекорд в меню, а в хранилище пишем в фоне
+        self.highscores = sorted(self.highscores + [score], reverse=True)[:5]
+        self.io.submit(self.store_score, score)
+    
+    def store_score(self, score):
+        self.score_store.add(score)
+        self.score_store.flush()
+        self.loaded_highscores = self.score_store.top_scores(5)
+    
+    def close_scores(self):
+        self.score_store.close()
     
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return False
+            
+            # Окно перекрыли или развернули - содержимое нужно восстановить
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.full_redraw = True
                 
-            if event.type == pygame.KEYDOWN:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.toggle_profiler()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                self.io.submit(self.profiler.dump(Config.TRACE_FILE))
+                print(f"Трасса кадров записывается в {Config.TRACE_FILE}")
+            elif event.type == pygame.KEYDOWN:
                 if self.in_menu:
                     self.handle_menu_events(event)
                 elif self.game_over:
@@ -327,6 +352,11 @@ class Game:
         
         return True
     
+    def toggle_profiler(self):
+        self.profiler.enabled = not self.profiler.enabled
+        self.sim.profiler = self.profiler if self.profiler.enabled else None
+        self.full_redraw = True  # убрать или показать оверлей
+    
     def handle_menu_events(self, event):
         if event.key == pygame.K_RETURN:
             self.in_menu = False
@@ -342,149 +372,372 @@ class Game:
             self.in_menu = True
     
     def handle_game_events(self, event):
+        if self.replay is not None:
+            self.handle_replay_events(event)
+            return
+        
         if event.key == pygame.K_UP:
-            self.snake.change_direction((0, -1))
+            self.queue_direction((0, -1))
         elif event.key == pygame.K_DOWN:
-            self.snake.change_direction((0, 1))
+            self.queue_direction((0, 1))
         elif event.key == pygame.K_LEFT:
-            self.snake.change_direction((-1, 0))
+            self.queue_direction((-1, 0))
         elif event.key == pygame.K_RIGHT:
-            self.snake.change_direction((1, 0))
+            self.queue_direction((1, 0))
         elif event.key == pygame.K_p:
             self.paused = not self.paused
+        elif event.key == pygame.K_TAB:
+            self.autopilot_enabled = not self.autopilot_enabled
+            self.input_queue.clear()
+            self.hud_dirty = True
         elif event.key == pygame.K_ESCAPE:
             self.in_menu = True
         elif event.key == pygame.K_w:
-            self.snake.change_direction((0, -1))
+            self.queue_direction((0, -1))
         elif event.key == pygame.K_s:
-            self.snake.change_direction((0, 1))
+            self.queue_direction((0, 1))
         elif event.key == pygame.K_a:
-            self.snake.change_direction((-1, 0))
+            self.queue_direction((-1, 0))
         elif event.key == pygame.K_d:
-            self.snake.change_direction((1, 0))
+            self.queue_direction((1, 0))
+    
+    def handle_replay_events(self, event):
+        # При просмотре записи стрелки перематывают, а не поворачивают
+        if event.key == pygame.K_RIGHT:
+            self.seek_replay(self.sim.tick + Config.REPLAY_SEEK_TICKS)
+        elif event.key == pygame.K_LEFT:
+            self.seek_replay(max(0, self.sim.tick - Config.REPLAY_SEEK_TICKS))
+        elif event.key == pygame.K_p:
+            self.paused = not self.paused
+        elif event.key == pygame.K_ESCAPE:
+            self.in_menu = True
+    
+    def seek_replay(self, tick):
+        # Вперед досчитываем текущую партию, назад - пересчитываем с начала
+        if tick < self.sim.tick:
+            self.sim = replay.seek(self.replay, tick)
+            self.sim.profiler = self.profiler if self.profiler.enabled else None
+        else:
+            while not self.sim.done and self.sim.tick < tick:
+                self.sim.step(self.replay.action(self.sim.tick + 1))
+        self.game_over = self.sim.done
+        self.prev_head = None
+        self.dirty_cells.clear()
+        self.full_redraw = True
+        self.update_camera(force=True)
+    
+    def queue_direction(self, direction):
+        # Повтор последнего поворота не занимает место в очереди. Когда
+        # очередь полна, новые нажатия отбрасываются: первый поворот в
+        # очереди самый срочный, его терять нельзя
+        if len(self.input_queue) >= Config.INPUT_QUEUE_SIZE:
+            return
+        last = self.input_queue[-1] if self.input_queue else self.snake.direction
+        if direction != last:
+            self.input_queue.append(direction)
     
     def update(self):
         if self.paused or self.game_over or self.in_menu:
             return
-            
-        # Движение змейки
-        if not self.snake.move(self.obstacles):
+        
+        # Снимок до тика - отдельными числами, без кортежей на каждый тик
+        snake = self.snake
+        old_head = snake.positions.head_cell()
+        old_food = self.food
+        old_obstacles = len(self.obstacles)
+        old_score, old_level = self.score, self.level
+        old_speed, old_slow = snake.has_effect('speed'), snake.has_effect('slow')
+        
+        if self.replay is not None:
+            action = self.replay.action(self.sim.tick + 1)
+            self.hud_dirty = True  # в HUD идет счетчик тиков записи
+        else:
+            if self.autopilot_enabled:
+                action = self.autopilot.decide(self.sim)
+            else:
+                action = self.input_queue.popleft() if self.input_queue else None
+            if self.recorder:
+                self.recorder.record(self.sim.tick + 1, action)
+        result = self.sim.step(action)
+        self.prev_head = old_head if snake.added_head is not None else None
+        self.mark_dirty(old_head, old_food, old_obstacles)
+        if self.score != old_score or self.level != old_level:
+            self.hud_dirty = True
+        if snake.has_effect('speed') != old_speed or snake.has_effect('slow') != old_slow:
+            # Эффект сменил цвет всей змейки: перерисовываем видимое окно
+            self.hud_dirty = True
+            self.full_redraw = True
+        self.update_camera()
+        
+        # Звуки по событиям тика (события бывают редко, пустой список не обходим)
+        if self.sound_manager and result.events:
+            for event in result.events:
+                self.sound_manager.play(event)
+        
+        if result.done:
             self.game_over = True
-            if self.sound_manager:
-                self.sound_manager.play('game_over')
-            self.save_highscore(self.score)
-            return
+            if self.replay is None:
+                self.save_highscore(self.score)
+            if self.recorder:
+                self.save_recording()
+    
+    def save_recording(self):
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{self.seed:08x}_{self.score}.snkr"
+        recording = self.recorder.finish(self.score, self.sim.tick)
+        self.io.submit(replay.save_replay, recording, os.path.join(Config.REPLAY_DIR, name))
+    
+    def mark_dirty(self, old_head, old_food, old_obstacles):
+        # Запоминаем клетки (упакованные), изменившиеся за тик
+        snake = self.snake
+        dirty = self.dirty_cells
+        if snake.added_head is not None:
+            dirty.add(snake.added_head)
+            dirty.add(old_head)  # бывшая голова стала телом
+        if snake.removed_tail is not None:
+            dirty.add(snake.removed_tail)
         
-        # Проверка на съедание еды
-        if self.snake.get_head_position() == self.food.position:
-            self.handle_food_collision()
+        if self.food is not old_food:
+            if old_food.cell is not None:
+                dirty.add(old_food.cell)
+            if self.food.cell is not None:
+                dirty.add(self.food.cell)
         
-        # Проверка на истечение времени жизни еды
-        if self.food.is_expired():
-            self.food = Food(self.snake.positions, self.obstacles)
+        if len(self.obstacles) != old_obstacles:
+            board = self.sim.board
+            for position in self.obstacles.last_added:
+                dirty.add(board.index(position))
     
-    def handle_food_collision(self):
-        score = Config.FOOD_SCORES[self.food.food_type]
-        self.score += score
+    def update_camera(self, force=False, head=None):
+        # Камера сдвигается скачком, когда голова подходит к краю экрана,
+        # и центрируется на голове; при этом экран перерисовывается целиком.
+        # Вызывается каждый тик, поэтому новый кортеж камеры создается
+        # только при сдвиге
+        board = self.sim.board
+        if head is None:
+            cell = self.snake.positions.head_cell()
+            head_x, head_y = cell % board.width, cell // board.width
+        else:
+            head_x, head_y = head
         
-        if self.sound_manager:
-            if self.food.food_type == FoodType.BONUS:
-                self.sound_manager.play('bonus')
-            else:
-                self.sound_manager.play('eat')
+        camera_x = self.camera_axis(head_x, self.camera[0], Config.GRID_WIDTH, board.width, force)
+        camera_y = self.camera_axis(head_y, self.camera[1], Config.GRID_HEIGHT, board.height, force)
+        if camera_x != self.camera[0] or camera_y != self.camera[1]:
+            self.camera = (camera_x, camera_y)
+            self.full_redraw = True
+    
+    def camera_axis(self, head, camera, view, size, force):
+        if size <= view:
+            return 0
+        offset = (head - camera) % size
+        if force or offset < Config.CAMERA_MARGIN or offset >= view - Config.CAMERA_MARGIN:
+            return (head - view // 2) % size
+        return camera
+    
+    def view_rects(self):
+        # Видимая часть поля в координатах поля; у края поле заворачивается,
+        # поэтому окно может распасться на несколько прямоугольников
+        board = self.sim.board
         
-        # Обработка эффектов еды
-        if self.food.food_type == FoodType.SPEED:
-            self.snake.add_effect('speed', Config.EFFECT_DURATION)
-            if self.sound_manager:
-                self.sound_manager.play('effect')
-        elif self.food.food_type == FoodType.SLOW:
-            self.snake.add_effect('slow', Config.EFFECT_DURATION)
-            if self.sound_manager:
-                self.sound_manager.play('effect')
-        
-        self.snake.grow_snake()
-        self.food = Food(self.snake.positions, self.obstacles)
-        
-        # Увеличение уровня каждые 50 очков
-        if self.score % 50 == 0:
-            self.speed += Config.SPEED_INCREMENT
-            self.level += 1
-            # Добавляем новое препятствие каждый уровень
-            if self.level % 2 == 0:
-                self.obstacles.append(Obstacle(self.snake.positions))
+        def spans(camera, view, size):
+            view = min(view, size)
+            result = [(camera, min(camera + view, size))]
+            if camera + view > size:
+                result.append((0, camera + view - size))
+            return result
+        
+        return [(x0, y0, x1, y1)
+                for x0, x1 in spans(self.camera[0], Config.GRID_WIDTH, board.width)
+                for y0, y1 in spans(self.camera[1], Config.GRID_HEIGHT, board.height)]
+    
+    def screen_cell(self, position):
+        # Клетка экрана для клетки поля или None, если она вне камеры
+        board = self.sim.board
+        x = (position[0] - self.camera[0]) % board.width
+        y = (position[1] - self.camera[1]) % board.height
+        if x >= Config.GRID_WIDTH or y >= Config.GRID_HEIGHT:
+            return None
+        return (x, y)
+    
+    def board_cell(self, x, y):
+        # Клетка поля под клеткой экрана или None за краем маленького поля
+        board = self.sim.board
+        if x >= board.width or y >= board.height:
+            return None
+        return ((self.camera[0] + x) % board.width, (self.camera[1] + y) % board.height)
+    
+    def cell_rect(self, position):
+        cell = self.screen_cell(position)
+        if cell is None:
+            return None
+        return pygame.Rect(
+            cell[0] * Config.GRID_SIZE, 
+            cell[1] * Config.GRID_SIZE, 
+            Config.GRID_SIZE, Config.GRID_SIZE
+        )
+    
+    def redraw_cell(self, position):
+        # Перерисовка одной клетки по сетке занятости
+        rect = self.cell_rect(position)
+        if rect is None:
+            return None
+        self.screen.fill(Config.WHITE, rect)
+        
+        cell = self.sim.board.get(position)
+        if cell == Board.SNAKE and position == self.snake.get_head_position() and self.interpolated_cells:
+            pass  # голову рисует draw_dirty поверх
+        elif cell == Board.SNAKE:
+            self.draw_cell(position, self.snake_color(position == self.snake.get_head_position()))
+        elif cell == Board.OBSTACLE:
+            self.draw_cell(position, Config.BLACK)
+        elif cell == Board.FOOD:
+            self.draw_food()
+        return rect
+    
+    def render_text(self, font, text, color):
+        # Текст рендерится один раз; меняющиеся строки (счет, уровень, рекорды)
+        # получают новый ключ, а старые вытесняются сбросом кэша
+        key = (text, font, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= self.TEXT_CACHE_SIZE:
+                self.text_cache.clear()
+            surface = font.render(text, True, color)
+            self.text_cache[key] = surface
+        return surface
+    
+    def get_sprite(self, color, blink=False):
+        # Клетка с обводкой, нарисованная заранее
+        key = (color, blink)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((Config.GRID_SIZE, Config.GRID_SIZE))
+            rect = sprite.get_rect()
+            sprite.fill(color)
+            pygame.draw.rect(sprite, Config.BLACK, rect, 2)  # Более толстая обводка
+            if blink:
+                inner_rect = pygame.Rect(4, 4, Config.GRID_SIZE - 8, Config.GRID_SIZE - 8)
+                pygame.draw.rect(sprite, Config.WHITE, inner_rect)
+            self.sprites[key] = sprite
+        return sprite
+    
+    def draw_cell(self, position, color, blink=False):
+        rect = self.cell_rect(position)
+        if rect is None:
+            return None
+        self.screen.blit(self.get_sprite(color, blink), rect)
+        return rect
+    
+    def draw_obstacles(self):
+        # Из индекса берутся только чанки, попавшие в камеру
+        for rect in self.view_rects():
+            for position in self.obstacles.cells_in_rect(*rect):
+                self.draw_cell(position, Config.BLACK)
+    
+    def draw_food(self):
+        if self.food.position is None:
+            return
+        # Анимация мигания для бонусной еды
+        blink = (self.food.food_type != FoodType.NORMAL and
+                 (pygame.time.get_ticks() // 200) % 2 == 0)
+        self.draw_cell(self.food.position, self.food.color, blink)
+    
+    def snake_color(self, is_head):
+        # Разные цвета для эффектов
+        if self.snake.has_effect('speed'):
+            return Config.BLUE
+        if self.snake.has_effect('slow'):
+            return Config.PURPLE
+        return (0, 180, 0) if is_head else (0, 220, 0)  # Более насыщенные зеленые
+    
+    def draw_snake(self):
+        positions = self.snake.positions
+        if len(positions) <= Config.GRID_WIDTH * Config.GRID_HEIGHT:
+            for i, position in enumerate(positions):
+                self.draw_cell(position, self.snake_color(i == 0))
+            return
+        
+        # Змейка длиннее экрана: дешевле пройти видимые клетки по сетке
+        board = self.sim.board
+        head = self.snake.get_head_position()
+        for x0, y0, x1, y1 in self.view_rects():
+            for y in range(y0, y1):
+                for x in range(x0, x1):
+                    if board.get((x, y)) == Board.SNAKE:
+                        self.draw_cell((x, y), self.snake_color((x, y) == head))
     
     def draw_hud(self):
         # Счет с золотым цветом
-        score_text = self.font.render(f'Счет: {self.score}', True, Config.GOLD)
-        level_text = self.font.render(f'Уровень: {self.level}', True, Config.BLACK)
+        score_text = self.render_text(self.font, f'Счет: {self.score}', Config.GOLD)
+        level_text = self.render_text(self.font, f'Уровень: {self.level}', Config.BLACK)
         
         self.screen.blit(score_text, (20, 20))  # Увеличил отступ
         self.screen.blit(level_text, (20, 60))
         
         # Информация об эффектах
-        y_offset = 100
+        y_offset = self.HUD_LINES_TOP
         if self.snake.has_effect('speed'):
-            effect_text = self.small_font.render('УСКОРЕНИЕ!', True, Config.BLUE)
+            effect_text = self.render_text(self.small_font, 'УСКОРЕНИЕ!', Config.BLUE)
             self.screen.blit(effect_text, (20, y_offset))
-            y_offset += 25
+            y_offset += self.HUD_LINE_STEP
         if self.snake.has_effect('slow'):
-            effect_text = self.small_font.render('ЗАМЕДЛЕНИЕ!', True, Config.PURPLE)
+            effect_text = self.render_text(self.small_font, 'ЗАМЕДЛЕНИЕ!', Config.PURPLE)
             self.screen.blit(effect_text, (20, y_offset))
+            y_offset += self.HUD_LINE_STEP
+        
+        if self.replay is not None:
+            replay_text = self.render_text(
+                self.small_font, f'ПОВТОР: {self.sim.tick}/{self.replay.ticks}  ←/→', Config.ORANGE)
+            self.screen.blit(replay_text, (20, y_offset))
+        elif self.autopilot_enabled:
+            autopilot_text = self.render_text(self.small_font, 'АВТОПИЛОТ (TAB)', Config.ORANGE)
+            self.screen.blit(autopilot_text, (20, y_offset))
         
         if self.paused:
-            pause_text = self.big_font.render('ПАУЗА', True, Config.BLUE)
+            pause_text = self.render_text(self.big_font, 'ПАУЗА', Config.BLUE)
             self.screen.blit(pause_text, (Config.WIDTH//2 - 100, Config.HEIGHT//2 - 40))
             
             # Подсказки управления в паузе
-            controls_text = self.small_font.render('Управление: Стрелки или WASD', True, Config.BLACK)
+            controls_text = self.render_text(self.small_font, 'Управление: Стрелки или WASD, TAB - автопилот', Config.BLACK)
             self.screen.blit(controls_text, (Config.WIDTH//2 - 150, Config.HEIGHT//2 + 20))
     
     def draw_menu(self):
         # Красивый фон меню
         self.screen.fill((240, 240, 240))  # Светло-серый фон
         
-        title = self.big_font.render('ЗМЕЙКА PRO', True, Config.GREEN)
-        start = self.font.render('ENTER - Начать игру', True, Config.BLUE)
-        exit_text = self.font.render('ESC - Выход', True, Config.RED)
-        
-        # Описание особенностей
-        features = [
-            '• Разные типы еды с эффектами',
-            '• Препятствия на поле',
-            '• Система уровней сложности',
-            '• Топ-5 рекордов'
-        ]
+        title = self.render_text(self.big_font, 'ЗМЕЙКА PRO', Config.GREEN)
+        start = self.render_text(self.font, 'ENTER - Начать игру', Config.BLUE)
+        exit_text = self.render_text(self.font, 'ESC - Выход', Config.RED)
         
         self.screen.blit(title, (Config.WIDTH//2 - 140, 60))
         self.screen.blit(start, (Config.WIDTH//2 - 150, 180))
         self.screen.blit(exit_text, (Config.WIDTH//2 - 100, 230))
         
         # Рекорды
-        highscores_text = self.font.render('ТОП-5 РЕКОРДОВ:', True, Config.GOLD)
+        highscores_text = self.render_text(self.font, 'ТОП-5 РЕКОРДОВ:', Config.GOLD)
         self.screen.blit(highscores_text, (Config.WIDTH//2 - 150, 300))
         
         for i, score in enumerate(self.highscores[:5]):
-            score_text = self.font.render(f'{i+1}. {score}', True, Config.BLACK)
+            score_text = self.render_text(self.font, f'{i+1}. {score}', Config.BLACK)
             self.screen.blit(score_text, (Config.WIDTH//2 - 50, 340 + i*40))
         
         # Особенности игры
-        features_title = self.font.render('ОСОБЕННОСТИ:', True, Config.PURPLE)
+        features_title = self.render_text(self.font, 'ОСОБЕННОСТИ:', Config.PURPLE)
         self.screen.blit(features_title, (Config.WIDTH//2 - 120, 550))
         
-        for i, feature in enumerate(features):
-            feature_text = self.small_font.render(feature, True, Config.BLACK)
+        for i, feature in enumerate(self.MENU_FEATURES):
+            feature_text = self.render_text(self.small_font, feature, Config.BLACK)
             self.screen.blit(feature_text, (Config.WIDTH//2 - 150, 590 + i*25))
     
     def draw_game_over(self):
-        overlay = pygame.Surface((Config.WIDTH, Config.HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 150))  # Более темный overlay
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.overlay, (0, 0))
         
-        game_over = self.big_font.render('ИГРА ОКОНЧЕНА!', True, Config.RED)
-        score_text = self.font.render(f'ВАШ СЧЕТ: {self.score}', True, Config.GOLD)  # Золотой цвет счета
-        restart = self.font.render('ENTER - Новая игра', True, Config.GREEN)
-        menu = self.font.render('ESC - Меню', True, Config.WHITE)
+        if self.sim.won:
+            game_over = self.render_text(self.big_font, 'ПОБЕДА! ПОЛЕ ЗАПОЛНЕНО', Config.GREEN)
+        else:
+            game_over = self.render_text(self.big_font, 'ИГРА ОКОНЧЕНА!', Config.RED)
+        score_text = self.render_text(self.font, f'ВАШ СЧЕТ: {self.score}', Config.GOLD)  # Золотой цвет счета
+        restart = self.render_text(self.font, 'ENTER - Новая игра', Config.GREEN)
+        menu = self.render_text(self.font, 'ESC - Меню', Config.WHITE)
         
         self.screen.blit(game_over, (Config.WIDTH//2 - 200, Config.HEIGHT//2 - 80))
         self.screen.blit(score_text, (Config.WIDTH//2 - 100, Config.HEIGHT//2 - 10))
@@ -492,6 +745,16 @@ class Game:
         self.screen.blit(menu, (Config.WIDTH//2 - 80, Config.HEIGHT//2 + 100))
     
     def draw(self):
+        # Полная перерисовка только при смене экрана (меню, пауза, конец игры),
+        # в игре обновляются лишь изменившиеся клетки
+        screen_state = (self.in_menu, self.game_over, self.paused)
+        if self.full_redraw or screen_state != self.drawn_screen:
+            self.draw_full()
+            self.drawn_screen = screen_state
+        elif not any(screen_state):
+            self.draw_dirty()
+    
+    def draw_full(self):
         # Фон без сетки - просто белый
         self.screen.fill(Config.WHITE)
         
@@ -499,35 +762,432 @@ class Game:
             self.draw_menu()
         else:
             # Рисуем препятствия
-            for obstacle in self.obstacles:
-                obstacle.draw(self.screen)
+            self.draw_obstacles()
             
-            self.snake.draw(self.screen)
-            self.food.draw(self.screen)
+            self.draw_snake()
+            self.draw_food()
             self.draw_hud()
             
             if self.game_over:
                 self.draw_game_over()
         
+        if self.profiler.enabled:
+            self.draw_profile()
+        
+        started = self.profiler.start()
         pygame.display.update()
+        self.profiler.stop('flip', started)
+        self.full_redraw = False
+        self.dirty_cells.clear()
+        self.hud_dirty = False
+    
+    def interpolated_head(self):
+        # Позиция головы между прошлой и текущей клеткой или None,
+        # если скользить нечему (тик без хода, переход через край)
+        head = self.snake.get_head_position()
+        if self.prev_head is None or self.alpha >= 1:
+            return None, []
+        board = self.sim.board
+        prev_head = board.position(self.prev_head)
+        start = self.screen_cell(prev_head)
+        end = self.screen_cell(head)
+        if start is None or end is None:
+            return None, []
+        dx = end[0] - start[0]
+        dy = end[1] - start[1]
+        if abs(dx) > 2 or abs(dy) > 2:
+            return None, []
+        
+        cells = [prev_head, head]
+        if abs(dx) == 2 or abs(dy) == 2:
+            cells.append(((prev_head[0] + dx // 2) % board.width,
+                          (prev_head[1] + dy // 2) % board.height))
+        x = (start[0] + dx * self.alpha) * Config.GRID_SIZE
+        y = (start[1] + dy * self.alpha) * Config.GRID_SIZE
+        return (round(x), round(y)), cells
+    
+    def draw_dirty(self):
+        # Мигание особой еды тоже меняет ее клетку
+        if self.food.cell is not None and self.food.food_type != FoodType.NORMAL:
+            blink_phase = (pygame.time.get_ticks() // 200) % 2
+            if blink_phase != self.blink_phase:
+                self.blink_phase = blink_phase
+                self.dirty_cells.add(self.food.cell)
+        
+        # Клетки под скользящей головой обновляются каждый кадр
+        board = self.sim.board
+        head_pos, head_cells = self.interpolated_head()
+        positions = {board.position(cell) for cell in self.dirty_cells}
+        positions.update(self.interpolated_cells)
+        positions.update(head_cells)
+        self.interpolated_cells = head_cells
+        
+        rects = [self.redraw_cell(position) for position in positions]
+        rects = [rect for rect in rects if rect is not None]
+        self.dirty_cells.clear()
+        
+        hud_dirty = self.hud_dirty or self.hud_rect.collidelist(rects) != -1
+        if hud_dirty:
+            # Текст HUD лежит поверх поля: стираем область, восстанавливаем
+            # клетки под ней и рисуем текст заново
+            self.repaint_region(self.hud_rect)
+            rects.append(self.hud_rect)
+            self.hud_dirty = False
+        
+        # Оверлей профайлера меняется каждый кадр
+        profile = self.profiler.enabled
+        if profile:
+            self.repaint_region(self.PROFILE_RECT)
+            rects.append(self.PROFILE_RECT)
+        
+        if head_pos is not None:
+            self.screen.blit(self.get_sprite(self.snake_color(True)), head_pos)
+        
+        if hud_dirty:
+            self.draw_hud()
+        if profile:
+            self.draw_profile()
+        
+        if rects:
+            started = self.profiler.start()
+            pygame.display.update(rects)
+            self.profiler.stop('flip', started)
+    
+    def repaint_region(self, rect):
+        # Стираем область экрана и восстанавливаем клетки поля под ней
+        self.screen.fill(Config.WHITE, rect)
+        for y in range(rect.top // Config.GRID_SIZE, rect.bottom // Config.GRID_SIZE + 1):
+            for x in range(rect.left // Config.GRID_SIZE, rect.right // Config.GRID_SIZE + 1):
+                position = self.board_cell(x, y)
+                if position is not None:
+                    self.redraw_cell(position)
+    
+    def draw_profile(self):
+        # Текст тут меняется каждый кадр, поэтому рендерится мимо кэша
+        p50, p99 = self.profiler.frame_percentiles(50, 99)
+        lines = [
+            f'кадр p50 {p50 * 1000:.2f} мс, p99 {p99 * 1000:.2f} мс',
+            f'бюджет: кадр {1000 / Config.FPS:.1f} мс, тик {1000 / self.speed:.1f} мс',
+        ]
+        for name, mean in sorted(self.profiler.phase_means().items()):
+            lines.append(f'{name}: {mean * 1e6:.0f} мкс')
+        
+        y = self.PROFILE_RECT.top + 5
+        for line in lines[:6]:
+            text = self.small_font.render(line, True, Config.ORANGE)
+            self.screen.blit(text, (self.PROFILE_RECT.left + 5, y))
+            y += 20
     
     def run(self):
+        # Фиксированный шаг: симуляция идет с частотой self.speed тиков
+        # в секунду, отрисовка - с частотой Config.FPS
         running = True
+        accumulator = 0.0
+        profiler = self.profiler
         while running:
+            dt = self.clock.tick(Config.FPS) / 1000
+            frame_started = profiler.start()
+            
+            started = profiler.start()
             running = self.handle_events()
+            profiler.stop('events', started)
             
             if not self.in_menu and not self.game_over and not self.paused:
-                self.update()
+                tick_time = 1 / self.speed
+                accumulator += dt
+                ticks = 0
+                while accumulator >= tick_time and ticks < Config.MAX_TICKS_PER_FRAME:
+                    started = profiler.start()
+                    self.update()
+                    profiler.stop('tick', started)
+                    accumulator -= tick_time
+                    ticks += 1
+                    if self.game_over:
+                        break
+                if ticks == Config.MAX_TICKS_PER_FRAME or self.game_over:
+                    accumulator = 0.0  # после долгой задержки не догоняем
+                self.alpha = min(accumulator / tick_time, 1.0)
+            else:
+                accumulator = 0.0
+                self.alpha = 1.0
             
+            self.apply_loaded()
+            started = profiler.start()
             self.draw()
-            self.clock.tick(self.speed if not self.paused else Config.FPS)
+            profiler.stop('draw', started)
+            self.startup.frame()
+            if profiler.enabled and frame_started:
+                profiler.frame(profiler.start() - frame_started)
         
+        # Перед выходом дописываем все, что осталось в очереди
+        self.io.submit(self.close_scores)
+        self.io.close()
         pygame.quit()
 
 
+class NetworkGame(Game):
+    # Клиент сетевой игры: комната живет на сервере, окно шлет повороты
+    # и рисует зеркало ее состояния (arena.RemoteState). Змеек несколько,
+    # и каждая меняется каждый тик, поэтому кадр рисуется целиком.
+    KEY_DIRECTIONS = {
+        pygame.K_UP: (0, -1), pygame.K_w: (0, -1),
+        pygame.K_DOWN: (0, 1), pygame.K_s: (0, 1),
+        pygame.K_LEFT: (-1, 0), pygame.K_a: (-1, 0),
+        pygame.K_RIGHT: (1, 0), pygame.K_d: (1, 0),
+    }
+    
+    # Цвета чужих змеек (своя - зеленая)
+    OTHER_COLORS = [Config.ORANGE, Config.PURPLE, Config.BLUE, (0, 150, 150), (150, 75, 0)]
+    
+    def __init__(self, connection, profile=False, startup=None):
+        self.connection = connection
+        self.state = None
+        self.disconnected = False
+        super().__init__(profile=profile, startup=startup)
+    
+    def reset_game(self):
+        # Партию начинает сервер; пока нет приветствия, рисовать нечего
+        self.sim = self.state
+        self.game_over = False
+        self.paused = False
+        self.in_menu = False
+        self.full_redraw = True
+        self.camera = (0, 0)
+    
+    def update(self):
+        own_score = self.state.scores.get(self.state.player, 0) if self.state else 0
+        for message in self.connection.poll():
+            if message is None:
+                self.disconnected = True
+            elif message['type'] == 'welcome':
+                self.state = self.sim = RemoteState(message)
+            elif self.state is not None:
+                self.state.apply(message)
+        if self.state is None:
+            return
+        
+        was_alive = not self.game_over
+        self.game_over = not self.state.alive
+        if self.sound_manager:
+            if self.state.scores.get(self.state.player, 0) > own_score:
+                self.sound_manager.play('eat')
+            if was_alive and self.game_over:
+                self.sound_manager.play('game_over')
+        self.update_camera()
+    
+    def update_camera(self, force=False):
+        if self.state is not None and self.state.alive:
+            super().update_camera(force, self.state.head())
+    
+    def toggle_profiler(self):
+        # Тиков здесь нет, профайлер нужен только кадру
+        self.profiler.enabled = not self.profiler.enabled
+    
+    def handle_game_events(self, event):
+        direction = self.KEY_DIRECTIONS.get(event.key)
+        if direction is not None:
+            self.connection.send({'type': 'dir', 'dir': direction})
+        elif event.key == pygame.K_ESCAPE:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+    
+    def handle_game_over_events(self, event):
+        if event.key == pygame.K_RETURN:
+            self.connection.send({'type': 'respawn'})
+        elif event.key == pygame.K_ESCAPE:
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+    
+    def draw(self):
+        self.screen.fill(Config.WHITE)
+        state = self.state
+        if state is None or self.disconnected:
+            message = 'Соединение потеряно' if self.disconnected else 'Подключение к серверу...'
+            text = self.render_text(self.font, message, Config.BLACK)
+            self.screen.blit(text, (Config.WIDTH//2 - 150, Config.HEIGHT//2 - 20))
+        else:
+            for position in state.obstacles:
+                self.draw_cell(position, Config.BLACK)
+            for player, body in state.snakes.items():
+                if player == state.player:
+                    head_color, body_color = (0, 180, 0), (0, 220, 0)
+                else:
+                    head_color = body_color = self.OTHER_COLORS[player % len(self.OTHER_COLORS)]
+                for i, position in enumerate(body):
+                    self.draw_cell(position, head_color if i == 0 else body_color)
+            if state.food is not None:
+                x, y, food_type = state.food
+                blink = (food_type != FoodType.NORMAL and
+                         (pygame.time.get_ticks() // 200) % 2 == 0)
+                self.draw_cell((x, y), Config.FOOD_COLORS[food_type], blink)
+            self.draw_hud()
+            if self.game_over:
+                self.draw_game_over()
+            if self.profiler.enabled:
+                self.draw_profile()
+        
+        started = self.profiler.start()
+        pygame.display.update()
+        self.profiler.stop('flip', started)
+    
+    def draw_hud(self):
+        state = self.state
+        score = state.scores.get(state.player, 0)
+        score_text = self.render_text(self.font, f'Счет: {score}', Config.GOLD)
+        self.screen.blit(score_text, (20, 20))
+        
+        # Лучшие игроки комнаты
+        leaders = sorted(state.scores.items(), key=lambda item: item[1], reverse=True)[:3]
+        for i, (player, player_score) in enumerate(leaders):
+            color = Config.GREEN if player == state.player else Config.BLACK
+            text = self.render_text(self.small_font, f'Игрок {player}: {player_score}', color)
+            self.screen.blit(text, (20, 60 + i * 25))
+    
+    def draw_game_over(self):
+        self.screen.blit(self.overlay, (0, 0))
+        game_over = self.render_text(self.big_font, 'ВЫ ПОГИБЛИ', Config.RED)
+        restart = self.render_text(self.font, 'ENTER - Снова в игру', Config.GREEN)
+        exit_text = self.render_text(self.font, 'ESC - Выход', Config.WHITE)
+        self.screen.blit(game_over, (Config.WIDTH//2 - 150, Config.HEIGHT//2 - 80))
+        self.screen.blit(restart, (Config.WIDTH//2 - 150, Config.HEIGHT//2 + 10))
+        self.screen.blit(exit_text, (Config.WIDTH//2 - 90, Config.HEIGHT//2 + 60))
+    
+    def run(self):
+        # Темп задает сервер: каждый кадр забираем пришедшие дельты и рисуем
+        running = True
+        profiler = self.profiler
+        while running:
+            self.clock.tick(Config.FPS)
+            frame_started = profiler.start()
+            
+            started = profiler.start()
+            running = self.handle_events()
+            profiler.stop('events', started)
+            
+            started = profiler.start()
+            self.update()
+            profiler.stop('tick', started)
+            
+            self.apply_loaded()
+            started = profiler.start()
+            self.draw()
+            profiler.stop('draw', started)
+            self.startup.frame()
+            if profiler.enabled and frame_started:
+                profiler.frame(profiler.start() - frame_started)
+        
+        self.connection.close()
+        self.io.submit(self.close_scores)
+        self.io.close()
+        pygame.quit()
+
+def board_size(value):
+    # Размер поля вида 200x150
+    try:
+        width, height = (int(part) for part in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается ШИРИНАxВЫСОТА, получено '{value}'")
+    if not (5 <= width <= Config.MAX_BOARD_SIZE and 5 <= height <= Config.MAX_BOARD_SIZE):
+        raise argparse.ArgumentTypeError(f"размер поля должен быть от 5 до {Config.MAX_BOARD_SIZE}")
+    return width, height
+
 def main():
+    parser = argparse.ArgumentParser(description='Змейка')
+    parser.add_argument('command', nargs='?', default='play',
+                        choices=['play', 'tournament', 'replay', 'verify', 'server', 'connect'],
+                        help='play - игра в окне, tournament - турнир ботов без окна, '
+                             'replay - просмотр записи, verify - проверка записей без окна, '
+                             'server - сервер сетевой игры, connect - игра на сервере')
+    parser.add_argument('files', nargs='*',
+                        help='файлы записей для replay и verify')
+    parser.add_argument('--scores', default=Config.SCORE_STORE,
+                        help="хранилище рекордов: 'sqlite:путь' или 'json:путь'")
+    parser.add_argument('--profile', action='store_true',
+                        help='сразу включить профайлер кадра (F3 - оверлей, F4 - трасса)')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='напечатать время импорта, инициализации и первого кадра')
+    parser.add_argument('--record', action='store_true',
+                        help=f'записывать партии в папку {Config.REPLAY_DIR}')
+    parser.add_argument('--host', default=None,
+                        help='адрес сервера для connect или адрес, который слушает server')
+    parser.add_argument('--port', type=int, default=Config.NET_PORT,
+                        help='порт сервера сетевой игры')
+    parser.add_argument('--room', default='default',
+                        help='комната на сервере для connect')
+    parser.add_argument('--board', type=board_size, default=(None, None),
+                        help='размер поля в клетках, например 200x200')
+    parser.add_argument('--headless', action='store_true',
+                        help='прогнать партии без окна и звука')
+    parser.add_argument('--games', type=int, default=100,
+                        help='число партий для --headless и для каждого бота в турнире')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='зерно генератора для --headless и турнира')
+    parser.add_argument('--max-ticks', type=int, default=Config.HEADLESS_MAX_TICKS,
+                        help='ограничение длины одной партии в тиках')
+    parser.add_argument('--agent', default='random',
+                        help="бот для --headless: random, greedy, autopilot или 'модуль:функция'")
+    parser.add_argument('--agents', default='random,greedy',
+                        help="боты турнира через запятую: random, greedy, autopilot или 'модуль:функция'")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='число процессов турнира (по умолчанию - по числу ядер)')
+    parser.add_argument('--output', default='tournament.csv',
+                        help='файл с результатами всех партий турнира')
+    args = parser.parse_args()
+    startup.enabled = args.profile_startup
+    
+    if args.command == 'tournament':
+        import tournament
+        agents = [spec.strip() for spec in args.agents.split(',') if spec.strip()]
+        results, elapsed = tournament.run_tournament(
+            agents, args.games, args.seed, args.workers, args.max_ticks,
+            width=args.board[0], height=args.board[1])
+        tournament.write_results(results, args.output)
+        tournament.print_summary(tournament.summarize(results),
+                                 sum(result['ticks'] for result in results), elapsed)
+        print(f"Результаты: {args.output}")
+        return
+    
+    if args.command == 'server':
+        import network
+        network.run_server(args.host or '0.0.0.0', args.port)
+        return
+    
+    if args.command == 'verify':
+        results, elapsed = replay.verify_files(args.files)
+        for path, ok, note in results:
+            print(f"{'OK  ' if ok else 'FAIL'} {path}: {note}")
+        print(f"Проверено записей: {len(results)} за {elapsed:.2f} с")
+        if not all(ok for _, ok, _ in results):
+            raise SystemExit(1)
+        return
+    
+    if args.headless:
+        import tournament
+        agent = tournament.load_agent(args.agent)
+        results, total_ticks, elapsed = run_headless(args.games, args.seed, agent, args.max_ticks,
+                                                    width=args.board[0], height=args.board[1])
+        scores = [score for score, _, _, _ in results]
+        print(f"Партий: {len(results)}, тиков: {total_ticks}, время: {elapsed:.2f} с")
+        print(f"Тиков в секунду: {total_ticks / max(elapsed, 1e-9):.0f}")
+        print(f"Средний счет: {sum(scores) / max(len(scores), 1):.1f}, лучший: {max(scores, default=0)}")
+        return
+    
+    recording = None
+    if args.command == 'replay':
+        if len(args.files) != 1:
+            parser.error('для replay нужен ровно один файл записи')
+        recording = replay.load_replay(args.files[0])
+    
+    if args.command == 'connect':
+        import network
+        connection = network.Connection(args.host or '127.0.0.1', args.port, args.room)
+        pygame.init()
+        startup.mark('pygame.init')
+        NetworkGame(connection, profile=args.profile, startup=startup).run()
+        return
+    
     pygame.init()
-    game = Game()
+    startup.mark('pygame.init')
+    game = Game(args.board, record=args.record, replay=recording, score_store=args.scores,
+                profile=args.profile, startup=startup)
     game.run()
 
 if __name__ == "__main__":
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import queue
+import random
+import socket
+import threading
+import time
+
+from arena import Arena
+from engine import DIRECTIONS, Config
+from profiler import Profiler
+
+# Сервер сетевой игры на asyncio и клиент для окна.
+#
+# Протокол - JSON по строке на сообщение поверх TCP. Клиент первым
+# сообщением выбирает комнату {"type": "join", "room": "имя"}, дальше шлет
+# {"type": "dir", "dir": [dx, dy]} и {"type": "respawn"}. Сервер отвечает
+# полным состоянием комнаты ("welcome"), а потом каждый тик рассылает
+# дельту ("tick", см. arena.py). Все комнаты тикают в одной задаче, дельта
+# кодируется один раз на комнату и пишется всем ее клиентам без ожидания;
+# клиент, у которого копится больше Config.NET_MAX_BUFFER неотправленных
+# байт, отключается, чтобы не тормозить остальных.
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+class Room:
+    def __init__(self, name, seed=None):
+        self.name = name
+        self.arena = Arena(seed)
+        self.clients = {}  # игрок -> StreamWriter
+
+    def join(self, writer):
+        player = self.arena.add_player()
+        self.clients[player] = writer
+        writer.write(encode(self.arena.welcome(player)))
+        return player
+
+    def leave(self, player):
+        self.clients.pop(player, None)
+        self.arena.remove_player(player)
+
+    def handle(self, player, message):
+        kind = message.get('type')
+        if kind == 'dir':
+            direction = message.get('dir')
+            if isinstance(direction, list) and len(direction) == 2:
+                self.arena.set_action(player, tuple(direction))
+        elif kind == 'respawn':
+            self.arena.spawn(player)
+
+    def tick(self):
+        data = encode(self.arena.step())
+        for player, writer in list(self.clients.items()):
+            if writer.transport.get_write_buffer_size() > Config.NET_MAX_BUFFER:
+                writer.close()
+                self.leave(player)
+            else:
+                writer.write(data)
+
+class Server:
+    def __init__(self, tick_rate=None):
+        self.tick_rate = tick_rate or Config.NET_TICK_RATE
+        self.rooms = {}
+        # Задержки тиков: кадр профайлера - тик всех комнат, фаза 'room' - одна комната
+        self.profiler = Profiler()
+        self.profiler.enabled = True
+        self.ticks = 0
+        self.late_ticks = 0  # тики, начавшиеся позже следующего по расписанию
+
+    async def handle_client(self, reader, writer):
+        room = player = None
+        try:
+            line = await reader.readline()
+            message = json.loads(line or b'{}')
+            if message.get('type') != 'join':
+                return
+            name = str(message.get('room', 'default'))
+            room = self.rooms.get(name)
+            if room is None:
+                room = self.rooms[name] = Room(name)
+            player = room.join(writer)
+            # Медленного клиента комната могла уже отключить сама; строки,
+            # оставшиеся в буфере, к ней больше не относятся
+            while player in room.clients:
+                line = await reader.readline()
+                if not line:
+                    break
+                room.handle(player, json.loads(line))
+        except (ConnectionError, ValueError, AttributeError):
+            pass  # оборванное соединение или мусор вместо JSON
+        finally:
+            if room is not None:
+                if player in room.clients:
+                    room.leave(player)
+                self.close_if_empty(room)
+            writer.close()
+
+    def close_if_empty(self, room):
+        if not room.clients and self.rooms.get(room.name) is room:
+            del self.rooms[room.name]
+
+    async def tick_loop(self):
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.tick_rate
+        deadline = loop.time()
+        profiler = self.profiler
+        while True:
+            deadline += interval
+            delay = deadline - loop.time()
+            if delay < 0:
+                # Не успели: пропускаем догоняющие тики, а не копим их
+                self.late_ticks += 1
+                deadline = loop.time()
+            await asyncio.sleep(max(delay, 0))
+            tick_started = profiler.start()
+            for room in list(self.rooms.values()):
+                started = profiler.start()
+                try:
+                    room.tick()
+                except Exception as e:
+                    # Ошибка в одной комнате не должна останавливать остальные
+                    print(f"Ошибка в комнате {room.name}: {e!r}")
+                profiler.stop('room', started)
+                self.close_if_empty(room)
+            profiler.frame(profiler.start() - tick_started)
+            self.ticks += 1
+
+    def metrics(self):
+        p50, p99 = self.profiler.frame_percentiles(50, 99)
+        return {
+            'rooms': len(self.rooms),
+            'players': sum(len(room.clients) for room in self.rooms.values()),
+            'ticks': self.ticks,
+            'late_ticks': self.late_ticks,
+            'tick_p50_ms': p50 * 1e3,
+            'tick_p99_ms': p99 * 1e3,
+            'room_mean_us': self.profiler.phase_means().get('room', 0.0) * 1e6,
+            'tick_budget_ms': 1e3 / self.tick_rate,
+        }
+
+    async def report_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print(format_metrics(self.metrics()))
+
+    async def serve(self, host, port, report=Config.NET_REPORT_SECONDS):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        tasks = [asyncio.create_task(self.tick_loop())]
+        if report:
+            tasks.append(asyncio.create_task(self.report_loop(report)))
+        return server, tasks
+
+def format_metrics(metrics):
+    return (f"комнат {metrics['rooms']}, игроков {metrics['players']}, "
+            f"тик p50 {metrics['tick_p50_ms']:.2f} мс, p99 {metrics['tick_p99_ms']:.2f} мс "
+            f"(бюджет {metrics['tick_budget_ms']:.0f} мс), комната {metrics['room_mean_us']:.0f} мкс, "
+            f"опозданий {metrics['late_ticks']}")
+
+def run_server(host='0.0.0.0', port=None):
+    async def main():
+        server, tasks = await Server().serve(host, port or Config.NET_PORT)
+        print(f"Сервер слушает {host}:{port or Config.NET_PORT}")
+        async with server:
+            await server.serve_forever()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+class Connection:
+    # Клиент для окна: блокирующий сокет, чтение в отдельном потоке,
+    # принятые сообщения копятся в очереди до следующего кадра
+    def __init__(self, host, port, room='default'):
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.messages = queue.Queue()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.send({'type': 'join', 'room': room})
+        self.thread = threading.Thread(target=self.read, name='network-reader', daemon=True)
+        self.thread.start()
+
+    def read(self):
+        try:
+            with self.socket.makefile('rb') as stream:
+                for line in stream:
+                    self.messages.put(json.loads(line))
+        except (OSError, ValueError):
+            pass
+        self.closed = True
+        self.messages.put(None)  # соединение закрыто
+
+    def send(self, message):
+        with self.lock:
+            try:
+                self.socket.sendall(encode(message))
+            except OSError:
+                self.closed = True
+
+    def poll(self):
+        # Все сообщения, пришедшие с прошлого кадра
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def close(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
+async def bot_client(host, port, room, seconds, stats):
+    # Клиент нагрузочного теста: читает дельты и иногда поворачивает
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode({'type': 'join', 'room': room}))
+    rng = random.Random(room)
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            line = await reader.readline()
+            if not line:
+                break
+            stats['messages'] += 1
+            stats['bytes'] += len(line)
+            if rng.random() < 0.1:
+                writer.write(encode({'type': 'dir', 'dir': rng.choice(DIRECTIONS)}))
+            if b'"died"' in line:
+                writer.write(encode({'type': 'respawn'}))
+    finally:
+        writer.close()
+
+async def load_test(rooms=200, players=2, seconds=5.0, tick_rate=None):
+    # Сервер и клиенты в одном процессе по loopback; клиенты тоже тратят
+    # процессор, так что задержки тиков получаются с запасом
+    server = Server(tick_rate)
+    listener, tasks = await server.serve('127.0.0.1', 0, report=None)
+    port = listener.sockets[0].getsockname()[1]
+    stats = {'messages': 0, 'bytes': 0}
+    clients = [bot_client('127.0.0.1', port, f'room{room}', seconds, stats)
+               for room in range(rooms) for _ in range(players)]
+    await asyncio.gather(*clients, return_exceptions=True)
+    metrics = server.metrics()
+    for task in tasks:
+        task.cancel()
+    listener.close()
+    await listener.wait_closed()
+    metrics['rooms'] = rooms
+    metrics['players'] = rooms * players
+    metrics['messages'] = stats['messages']
+    metrics['bytes_per_message'] = stats['bytes'] / max(stats['messages'], 1)
+    return metrics
+
+if __name__ == "__main__":
+    metrics = asyncio.run(load_test())
+    print(format_metrics(metrics))
+    print(f"сообщений {metrics['messages']}, в среднем {metrics['bytes_per_message']:.0f} байт")
@@ -0,0 +1,117 @@
+import json
+import time
+from array import array
+
+from engine import Config
+
+# Замер времени фаз кадра (события, ход, еда, отрисовка, вывод на экран)
+# в кольцевой буфер. Выключенный профайлер возвращается из stop сразу,
+# а движку он вообще не передается, так что без него цена почти нулевая.
+
+class Profiler:
+    def __init__(self, capacity=None, frames=None):
+        self.enabled = False
+        self.capacity = capacity or Config.PROFILE_BUFFER_SIZE
+        self.names = [''] * self.capacity
+        self.starts = array('d', bytes(8 * self.capacity))
+        self.durations = array('d', bytes(8 * self.capacity))
+        self.count = 0
+        self.frame_capacity = frames or Config.PROFILE_FRAMES
+        self.frame_times = array('d', bytes(8 * self.frame_capacity))
+        self.frame_count = 0
+        self.origin = time.perf_counter()
+
+    def start(self):
+        return time.perf_counter() if self.enabled else 0.0
+
+    def stop(self, name, started):
+        # started == 0.0: фазу начали, когда профайлер был выключен (F3
+        # посреди кадра), ее длительность неизвестна
+        if not self.enabled or not started:
+            return
+        i = self.count % self.capacity
+        self.names[i] = name
+        self.starts[i] = started
+        self.durations[i] = time.perf_counter() - started
+        self.count += 1
+
+    def frame(self, duration):
+        if not self.enabled:
+            return
+        self.frame_times[self.frame_count % self.frame_capacity] = duration
+        self.frame_count += 1
+
+    def records(self):
+        # Записи из буфера от старых к новым
+        count = min(self.count, self.capacity)
+        first = self.count - count
+        for n in range(first, self.count):
+            i = n % self.capacity
+            yield self.names[i], self.starts[i], self.durations[i]
+
+    def frame_percentiles(self, *percents):
+        count = min(self.frame_count, self.frame_capacity)
+        if not count:
+            return [0.0 for _ in percents]
+        frames = sorted(self.frame_times[:count])
+        return [frames[min(int(count * p / 100), count - 1)] for p in percents]
+
+    def phase_means(self):
+        totals, counts = {}, {}
+        for name, _, duration in self.records():
+            totals[name] = totals.get(name, 0.0) + duration
+            counts[name] = counts.get(name, 0) + 1
+        return {name: totals[name] / counts[name] for name in totals}
+
+    def chrome_trace(self):
+        # Формат Chrome trace (chrome://tracing, Perfetto): события "X" в микросекундах
+        events = [{
+            'name': name, 'ph': 'X', 'pid': 1, 'tid': 1,
+            'ts': (started - self.origin) * 1e6, 'dur': duration * 1e6,
+        } for name, started, duration in self.records()]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path):
+        # Снимок берется сразу, а запись файла можно отдать в фон
+        trace = self.chrome_trace()
+
+        def write():
+            with open(path, 'w') as f:
+                json.dump(trace, f)
+        return write
+
+class StartupTimer:
+    # Отметки времени запуска: импорты, окно, фоновые загрузки и первый
+    # кадр. Отметки копятся всегда (это дешево), а печатаются только с
+    # --profile-startup: все разом после первого кадра, поздние (фоновые
+    # загрузки) - по мере появления.
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.marks = []
+        self.enabled = False
+        self.reported = False
+        self.first_frame = None
+
+    def mark(self, name):
+        now = time.perf_counter()
+        previous = self.marks[-1][1] if self.marks else self.origin
+        self.marks.append((name, now))
+        if self.enabled and self.reported:
+            self.print_mark(name, now, previous)
+
+    def frame(self):
+        # Вызывается после каждого кадра, отчет - только после первого
+        if self.first_frame is not None:
+            return
+        self.mark('первый кадр')
+        self.first_frame = self.marks[-1][1] - self.origin
+        if self.enabled:
+            print('Запуск (мс): шаг, с начала импорта')
+            previous = self.origin
+            for name, at in self.marks:
+                self.print_mark(name, at, previous)
+                previous = at
+            self.reported = True
+
+    def print_mark(self, name, at, previous):
+        print(f'  {name:<24} {(at - previous) * 1e3:8.1f} {(at - self.origin) * 1e3:8.1f}')
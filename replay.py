@@ -0,0 +1,120 @@
+import os
+import struct
+import time
+
+from engine import DIRECTIONS, Config, Simulation
+
+# Запись партии: зерно генератора, размер поля и повороты по тикам.
+# Этого достаточно, чтобы движок без окна повторил партию клетка
+# в клетку и проверил итоговый счет.
+#
+# Формат файла: заголовок MAGIC, версия, зерно, ширина, высота,
+# итоговый счет и число тиков, затем повороты. Каждый поворот - одно
+# varint-число (разница тиков с прошлым поворотом << 2) | номер направления,
+# обычно это 1-2 байта.
+
+MAGIC = b'SNKR'
+VERSION = 1
+HEADER = struct.Struct('<4sBIHHII')
+
+class Replay:
+    __slots__ = ('seed', 'width', 'height', 'score', 'ticks', 'inputs')
+
+    def __init__(self, seed, width, height, score=0, ticks=0, inputs=None):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.score = score
+        self.ticks = ticks
+        self.inputs = inputs if inputs is not None else {}  # тик -> направление
+
+    def action(self, tick):
+        return self.inputs.get(tick)
+
+class Recorder:
+    # Пишет повороты, которые Game передает в Simulation.step
+    def __init__(self, seed, width, height):
+        self.replay = Replay(seed, width, height)
+
+    def record(self, tick, action):
+        if action is not None:
+            self.replay.inputs[tick] = action
+
+    def finish(self, score, ticks):
+        self.replay.score = score
+        self.replay.ticks = ticks
+        return self.replay
+
+def encode(replay):
+    out = bytearray(HEADER.pack(MAGIC, VERSION, replay.seed, replay.width, replay.height,
+                                replay.score, replay.ticks))
+    last_tick = 0
+    for tick in sorted(replay.inputs):
+        value = ((tick - last_tick) << 2) | DIRECTIONS.index(replay.inputs[tick])
+        last_tick = tick
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+def decode(data):
+    magic, version, seed, width, height, score, ticks = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('не файл записи партии или неизвестная версия')
+    # Заголовок из чужого файла: огромное поле не должно съесть память,
+    # а миллиарды тиков - часы проверки
+    if not (5 <= width <= Config.MAX_BOARD_SIZE and 5 <= height <= Config.MAX_BOARD_SIZE):
+        raise ValueError(f'размер поля {width}x{height} вне 5..{Config.MAX_BOARD_SIZE}')
+    if ticks > Config.REPLAY_MAX_TICKS:
+        raise ValueError(f'слишком длинная запись: {ticks} тиков')
+
+    inputs = {}
+    tick = 0
+    value = shift = 0
+    for byte in data[HEADER.size:]:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            tick += value >> 2
+            inputs[tick] = DIRECTIONS[value & 3]
+            value = shift = 0
+    return Replay(seed, width, height, score, ticks, inputs)
+
+def save_replay(replay, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(encode(replay))
+
+def load_replay(path):
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+def seek(replay, tick):
+    # Партия, перемотанная к началу тика tick (без окна, с максимальной скоростью)
+    sim = Simulation(replay.seed, replay.width, replay.height)
+    inputs = replay.inputs
+    while not sim.done and sim.tick < tick:
+        sim.step(inputs.get(sim.tick + 1))
+    return sim
+
+def verify(replay):
+    # Пересчитываем партию и сверяем счет и длину с записанными
+    sim = seek(replay, replay.ticks)
+    return sim.score == replay.score and sim.tick == replay.ticks, sim
+
+def verify_files(paths):
+    results = []
+    started = time.perf_counter()
+    for path in paths:
+        try:
+            replay = load_replay(path)
+        except (OSError, ValueError, struct.error) as e:
+            results.append((path, False, f'не прочитан: {e}'))
+            continue
+        ok, sim = verify(replay)
+        note = f'счет {sim.score}, записан {replay.score}, тиков {sim.tick}'
+        results.append((path, ok, note))
+    return results, time.perf_counter() - started
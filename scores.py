@@ -0,0 +1,168 @@
+import getpass
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка файла недоступна
+    fcntl = None
+
+from engine import Config
+
+# Хранилища рекордов. Записи копятся в памяти и пишутся пачкой
+# (flush), поэтому много процессов с концами партий не дерутся за файл
+# на каждую запись. По умолчанию - SQLite в режиме WAL с индексом по
+# счету; JSON-файл оставлен для совместимости со старым highscores.json.
+
+def default_player():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return 'player'
+
+class ScoreStore:
+    def __init__(self):
+        self.pending = []
+
+    def add(self, score, player=None):
+        self.pending.append((player or default_player(), int(score), time.time()))
+        if len(self.pending) >= Config.SCORE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.write(self.pending)
+            self.pending = []
+
+    def top(self, k=5):
+        # Лучшие k записей как (игрок, счет, время)
+        self.flush()
+        return self.read_top(k)
+
+    def top_scores(self, k=5):
+        return [score for _, score, _ in self.top(k)]
+
+    def close(self):
+        self.flush()
+
+class SqliteScoreStore(ScoreStore):
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30)
+        # WAL: читатели не ждут писателя, писатели ставятся в очередь по busy timeout
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS scores ('
+                'id INTEGER PRIMARY KEY, player TEXT NOT NULL, '
+                'score INTEGER NOT NULL, created REAL NOT NULL)')
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC)')
+        self.import_legacy()
+
+    def import_legacy(self):
+        # Переносим старый highscores.json в пустую базу один раз. Проверка
+        # и вставка идут в одной транзакции BEGIN IMMEDIATE: из процессов,
+        # открывших базу одновременно, импортирует только первый
+        if not os.path.exists(Config.SCORE_FILE):
+            return
+        legacy = JsonScoreStore(Config.SCORE_FILE).read_top(None)
+        if not legacy:
+            return
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            if self.connection.execute('SELECT 1 FROM scores LIMIT 1').fetchone():
+                return
+            self.connection.executemany(
+                'INSERT INTO scores (player, score, created) VALUES (?, ?, ?)', legacy)
+
+    def write(self, entries):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO scores (player, score, created) VALUES (?, ?, ?)', entries)
+
+    def read_top(self, k):
+        return self.connection.execute(
+            'SELECT player, score, created FROM scores ORDER BY score DESC LIMIT ?',
+            (-1 if k is None else k,)).fetchall()
+
+    def close(self):
+        super().close()
+        self.connection.close()
+
+class JsonScoreStore(ScoreStore):
+    # Старый формат: список очков или записей. Пишется через временный
+    # файл и os.replace, чтобы файл никогда не оставался обрезанным,
+    # и под блокировкой, чтобы параллельные записи не терялись.
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        entries = []
+        for item in data:
+            if isinstance(item, (int, float)):
+                entries.append(('legacy', int(item), 0.0))
+            else:
+                entries.append((item['player'], int(item['score']), item['created']))
+        return entries
+
+    def write(self, entries):
+        with self.locked():
+            merged = self.load() + list(entries)
+            merged.sort(key=lambda entry: entry[1], reverse=True)
+            merged = merged[:Config.JSON_SCORE_LIMIT]
+            data = [{'player': player, 'score': score, 'created': created}
+                    for player, score, created in merged]
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(data, f)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+    def read_top(self, k):
+        entries = sorted(self.load(), key=lambda entry: entry[1], reverse=True)
+        return entries if k is None else entries[:k]
+
+    def locked(self):
+        return FileLock(self.path + '.lock')
+
+class FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+def open_score_store(spec=None):
+    # Хранилище по строке вида 'sqlite:путь' или 'json:путь'
+    kind, _, path = (spec or Config.SCORE_STORE).partition(':')
+    if kind == 'sqlite':
+        return SqliteScoreStore(path)
+    if kind == 'json':
+        return JsonScoreStore(path)
+    raise ValueError(f"неизвестное хранилище рекордов '{spec}'")
@@ -0,0 +1,49 @@
+import random
+import tracemalloc
+
+from engine import Simulation, greedy_agent
+
+# Тик движка в установившемся режиме (змейка ползет, ничего не съедая)
+# не оставляет после себя памяти. Временную память он все же берет, и это
+# известный предел чистого Python: счетчики тиков и упакованные клетки
+# больше 256 - отдельные объекты int по 32 байта, новые на каждом тике.
+# Пара-тройка таких чисел живет в состоянии партии между тиками
+# (tick, clock, added_head, removed_tail), они лишь сменяют прежние.
+
+TICKS = 5000
+LIVE_INTS = 8 * 32       # байт: числа из состояния партии, сменившие прежние
+TRANSIENT_MEAN = 144     # байт: временная память тика в среднем (сейчас 4 числа, 128)
+TRANSIENT_MAX = 256      # байт: временная память самого тяжелого тика
+
+def steady_simulation():
+    # Змейка длиной больше одной клетки, дальше - прямо без еды
+    sim = Simulation(1)
+    rng = random.Random(0)
+    for _ in range(100):
+        sim.step(greedy_agent(sim, rng))
+    for _ in range(300):
+        sim.step()
+    assert len(sim.snake.positions) > 1 and sim.tick > 256
+    return sim
+
+def test_step_steady_state_allocations():
+    sim = steady_simulation()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        total = worst = 0
+        for _ in range(TICKS):
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            result = sim.step()
+            assert not result.events, 'партия вышла из установившегося режима'
+            transient = tracemalloc.get_traced_memory()[1] - current
+            total += transient
+            worst = max(worst, transient)
+        growth = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    assert growth <= LIVE_INTS, f'за {TICKS} тиков память выросла на {growth} байт'
+    mean = total / TICKS
+    assert mean <= TRANSIENT_MEAN, f'тик берет в среднем {mean:.0f} байт временной памяти'
+    assert worst <= TRANSIENT_MAX, f'тик взял {worst} байт временной памяти'
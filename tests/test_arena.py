@@ -0,0 +1,29 @@
+from arena import Arena, RemoteState
+from engine import DIRECTIONS, Board
+
+def test_float_direction_does_not_break_room():
+    # Клиент прислал {"type": "dir", "dir": [0.0, 1]}
+    arena = Arena(1)
+    player = arena.add_player()
+    arena.set_action(player, (0.0, 1))
+    assert type(arena.actions[player][0]) is int
+    for _ in range(20):
+        arena.step()
+
+def test_bool_direction_is_canonical():
+    arena = Arena(1)
+    player = arena.add_player()
+    arena.set_action(player, (True, 0))
+    assert arena.actions[player] == (1, 0) and arena.actions[player] is DIRECTIONS[3]
+
+def test_mirror_joined_on_cells_of_left_player():
+    # Между тиками один игрок ушел, а вошедший встал на его клетку
+    arena = Arena(1)
+    first, second = arena.add_player(), arena.add_player()
+    state = RemoteState(arena.welcome(first))
+    state.apply(arena.step())
+    position = state.snakes[second][0]
+    state.apply({'type': 'tick', 'tick': state.tick + 1,
+                 'left': [second], 'joined': [[99, [list(position)]]]})
+    assert state.board.get(position) == Board.SNAKE
+    assert list(state.snakes[99]) == [position]
@@ -0,0 +1,23 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from batch import check_parity
+from engine import greedy_agent
+
+# Пакетный движок против Simulation на ходах жадного бота: в отличие от
+# случайных поворотов он ест, ловит эффекты скорости и замедления,
+# набирает уровни с новыми препятствиями и дожидается истечения особой
+# еды, а на поле 4x4 еще и заполняет его целиком (победа).
+
+def test_parity_default_board():
+    assert check_parity(games=30, ticks=1000, agent=greedy_agent) == 1000
+
+def test_parity_small_board():
+    assert check_parity(games=100, ticks=500, width=6, height=6, agent=greedy_agent) == 500
+
+def test_parity_full_board_win():
+    assert check_parity(games=100, ticks=300, width=4, height=4, agent=greedy_agent) == 300
+
+def test_parity_random_actions():
+    check_parity(games=50, ticks=500)
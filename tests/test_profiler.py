@@ -0,0 +1,14 @@
+from profiler import Profiler
+
+def test_phase_started_while_disabled_is_not_recorded():
+    # Профайлер включили посреди фазы (F3 в handle_events)
+    profiler = Profiler(capacity=16, frames=16)
+    started = profiler.start()
+    profiler.enabled = True
+    profiler.stop('events', started)
+    assert list(profiler.records()) == []
+
+    started = profiler.start()
+    profiler.stop('events', started)
+    (name, _, duration), = profiler.records()
+    assert name == 'events' and 0 <= duration < 1
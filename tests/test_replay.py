@@ -0,0 +1,28 @@
+import pytest
+
+import replay
+from engine import Config
+
+def header(width, height, ticks):
+    return replay.HEADER.pack(replay.MAGIC, replay.VERSION, 1, width, height, 0, ticks)
+
+@pytest.mark.parametrize('width, height, ticks', [
+    (30000, 30000, 10),                     # поле не поместится в память
+    (0, 20, 10),                            # подменилось бы размером по умолчанию
+    (20, 20, Config.REPLAY_MAX_TICKS + 1),  # часы проверки
+])
+def test_decode_rejects_bad_header(width, height, ticks):
+    with pytest.raises(ValueError):
+        replay.decode(header(width, height, ticks))
+
+def test_verify_files_reports_bad_header(tmp_path):
+    path = tmp_path / 'huge.snkr'
+    path.write_bytes(header(30000, 30000, 10))
+    (result,), _ = replay.verify_files([str(path)])
+    assert result[1] is False
+
+def test_round_trip():
+    recorded = replay.Replay(7, 20, 15, 30, 400, {3: (0, 1), 250: (-1, 0)})
+    decoded = replay.decode(replay.encode(recorded))
+    assert (decoded.seed, decoded.width, decoded.height, decoded.score, decoded.ticks,
+            decoded.inputs) == (7, 20, 15, 30, 400, recorded.inputs)
@@ -0,0 +1,22 @@
+import pytest
+
+pytest.importorskip('numpy')
+pytest.importorskip('pygame')
+
+import numpy
+
+import main
+from engine import Config
+
+def test_broken_cache_file_is_regenerated(tmp_path, monkeypatch):
+    # Пустой .npy от оборванной записи не выключает звук навсегда
+    monkeypatch.setattr(Config, 'SOUND_CACHE_DIR', str(tmp_path))
+    spec = ((440,), 0.1, 44100, 0.05, 0.5)
+    fresh = main.SoundManager.load_cached(*spec)
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(b'')
+
+    buf = main.SoundManager.load_cached(*spec)
+    assert numpy.array_equal(buf, fresh)
+    assert numpy.array_equal(numpy.load(path), fresh)
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]  # временных файлов не осталось
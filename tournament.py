@@ -0,0 +1,99 @@
+import csv
+import importlib
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import Config, Simulation
+
+# Турнир ботов: каждый бот играет одни и те же N партий (одинаковые
+# зерна), партии раскладываются по процессам ProcessPoolExecutor.
+# Бот задается строкой 'модуль:функция', функция получает Simulation
+# и свой random.Random и возвращает направление или None.
+
+BUILTIN_AGENTS = {
+    'random': 'engine:random_agent',
+    'greedy': 'engine:greedy_agent',
+    'autopilot': 'autopilot:autopilot_agent',
+}
+
+RESULT_FIELDS = ['agent', 'seed', 'score', 'length', 'level', 'ticks', 'death_cause']
+
+def load_agent(spec):
+    spec = BUILTIN_AGENTS.get(spec, spec)
+    module_name, _, function_name = spec.partition(':')
+    if not function_name:
+        raise ValueError(f"бот задается как 'модуль:функция', получено '{spec}'")
+    return getattr(importlib.import_module(module_name), function_name)
+
+def play_game(task):
+    # Одна партия в процессе-работнике
+    agent_spec, seed, max_ticks, width, height = task
+    agent = load_agent(agent_spec)
+    random.seed(seed)  # для ботов, которые берут глобальный random
+    rng = random.Random(seed ^ 0x5EED)
+    sim = Simulation(seed, width, height)
+    while not sim.done and sim.tick < max_ticks:
+        sim.step(agent(sim, rng))
+    return {
+        'agent': agent_spec,
+        'seed': seed,
+        'score': sim.score,
+        'length': len(sim.snake.positions),
+        'level': sim.level,
+        'ticks': sim.tick,
+        'death_cause': sim.death_cause or 'timeout',
+    }
+
+def run_tournament(agents, games, seed=None, workers=None, max_ticks=Config.HEADLESS_MAX_TICKS,
+                   width=None, height=None):
+    for spec in agents:
+        load_agent(spec)  # ошибку в имени бота показываем сразу, а не в работнике
+
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(32) for _ in range(games)]
+    tasks = [(spec, game_seed, max_ticks, width, height) for spec in agents for game_seed in seeds]
+
+    workers = workers or os.cpu_count() or 1
+    # Крупные порции, чтобы пересылка задач не съедала выигрыш от процессов
+    chunksize = max(1, len(tasks) // (workers * 4))
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(play_game, tasks, chunksize=chunksize))
+    elapsed = time.perf_counter() - started
+    return results, elapsed
+
+def summarize(results):
+    summary = {}
+    for spec in dict.fromkeys(result['agent'] for result in results):
+        rows = [result for result in results if result['agent'] == spec]
+        scores = [row['score'] for row in rows]
+        summary[spec] = {
+            'games': len(rows),
+            'mean_score': statistics.mean(scores),
+            'median_score': statistics.median(scores),
+            'max_score': max(scores),
+            'mean_length': statistics.mean(row['length'] for row in rows),
+            'mean_level': statistics.mean(row['level'] for row in rows),
+            'death_causes': dict(Counter(row['death_cause'] for row in rows)),
+        }
+    return summary
+
+def write_results(results, path):
+    # Все партии пишутся одним проходом в конце
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+def print_summary(summary, total_ticks, elapsed):
+    for spec, stats in summary.items():
+        print(f"{spec}: партий {stats['games']}, счет средний {stats['mean_score']:.1f}, "
+              f"медиана {stats['median_score']}, лучший {stats['max_score']}, "
+              f"длина {stats['mean_length']:.1f}, уровень {stats['mean_level']:.2f}")
+        causes = ', '.join(f'{cause}: {count}' for cause, count in sorted(stats['death_causes'].items()))
+        print(f"  исходы: {causes}")
+    print(f"Время: {elapsed:.2f} с, тиков в секунду: {total_ticks / max(elapsed, 1e-9):.0f}")